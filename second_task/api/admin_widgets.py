@@ -0,0 +1,60 @@
+from django import forms
+from django.contrib.admin.widgets import AutocompleteSelect
+
+
+class RowAutocompleteSelect(AutocompleteSelect):
+    """
+    Виджет автодополнения, который берет выбранный объект из строки,
+    а не отдельным запросом. Без объекта строки или при другом значении
+    работает как AutocompleteSelect.
+    """
+
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.selected is None or str(self.selected.pk) not in value:
+            return super().optgroups(name, value, attr)
+        groups = [(None, [], 0)]
+        options = groups[0][1]
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, self.selected.pk,
+            self.choices.field.label_from_instance(self.selected), True,
+            len(options)))
+        return groups
+
+
+class RowAutocompleteForm(forms.ModelForm):
+    """
+    Форма строки списка админки: виджетам автодополнения передаются
+    связанные объекты, уже загруженные через list_select_related.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is None:
+            return
+        for name, field in self.fields.items():
+            widget = getattr(field.widget, 'widget', field.widget)
+            if isinstance(widget, RowAutocompleteSelect):
+                widget.selected = getattr(self.instance, name)
+
+
+class ListEditableAutocompleteMixin:
+    """
+    Примесь ModelAdmin для полей из autocomplete_fields в list_editable.
+    Каждая строка списка рисует свой виджет, и AutocompleteSelect
+    загружал бы выбранный объект запросом на строку; с примесью число
+    запросов списка не зависит от числа строк.
+    """
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault('widget', RowAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using')))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', RowAutocompleteForm)
+        return super().get_changelist_form(request, **kwargs)
@@ -0,0 +1,36 @@
+from threading import BoundedSemaphore
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from .constants import SERVICE_OVERLOADED
+from .profiling import measure
+
+
+class AdmissionControlMiddleware:
+    """
+    Ограничивает число запросов, которые процесс обрабатывает
+    одновременно, значением ADMISSION_MAX_CONCURRENCY. Запрос ждет
+    свободного места не дольше ADMISSION_QUEUE_TIMEOUT секунд, иначе
+    сразу получает 503 с Retry-After. Под перегрузкой очередь не растет,
+    и задержка принятых запросов остается ограниченной. Время ожидания
+    учитывается в профиле запроса как этап queue.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slots = BoundedSemaphore(settings.ADMISSION_MAX_CONCURRENCY)
+
+    def __call__(self, request):
+        with measure('queue'):
+            admitted = self.slots.acquire(
+                timeout=settings.ADMISSION_QUEUE_TIMEOUT)
+        if not admitted:
+            return JsonResponse(
+                SERVICE_OVERLOADED, status=503,
+                headers={'Retry-After': str(settings.ADMISSION_RETRY_AFTER)},
+                json_dumps_params={'ensure_ascii': False})
+        try:
+            return self.get_response(request)
+        finally:
+            self.slots.release()
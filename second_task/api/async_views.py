@@ -0,0 +1,73 @@
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.pagination import _positive_int
+from rest_framework.utils.encoders import JSONEncoder
+
+from product.models import Product
+from category.models import Category, Subcategory
+from .constants import NOT_FOUND
+from .pagination import SarafanPageNumberPagination
+from .serializers import (ProductSerializer, CategorySerializer,
+                          SubcategorySerializer)
+
+
+class AsyncCatalogView(View):
+    """
+    Асинхронное представление каталога только для чтения. Список и
+    отдельный объект читаются асинхронным ORM, без перехода в поток
+    синхронного DRF-представления под ASGI. Список поддерживает
+    параметры limit и offset.
+    """
+
+    queryset = None
+    serializer_class = None
+    max_limit = SarafanPageNumberPagination.max_page_size
+
+    def get_queryset(self):
+        return self.queryset.order_by('pk')
+
+    def get_page_bounds(self, request):
+        try:
+            limit = _positive_int(request.GET['limit'], strict=True,
+                                  cutoff=self.max_limit)
+        except (KeyError, ValueError):
+            limit = self.max_limit
+        try:
+            offset = _positive_int(request.GET['offset'])
+        except (KeyError, ValueError):
+            offset = 0
+        return offset, offset + limit
+
+    def render(self, data, status=200):
+        return JsonResponse(data, status=status, safe=False,
+                            encoder=JSONEncoder,
+                            json_dumps_params={'ensure_ascii': False})
+
+    async def get(self, request, pk=None):
+        context = {'request': request}
+        if pk is not None:
+            try:
+                instance = await self.get_queryset().aget(pk=pk)
+            except self.queryset.model.DoesNotExist:
+                return self.render(NOT_FOUND, status=404)
+            return self.render(
+                self.serializer_class(instance, context=context).data)
+        start, end = self.get_page_bounds(request)
+        objects = [obj async for obj in self.get_queryset()[start:end]]
+        return self.render(self.serializer_class(
+            objects, many=True, context=context).data)
+
+
+class AsyncProductView(AsyncCatalogView):
+    queryset = Product.objects.select_related('category', 'subcategory')
+    serializer_class = ProductSerializer
+
+
+class AsyncCategoryView(AsyncCatalogView):
+    queryset = Category.objects.prefetch_related('subcategory')
+    serializer_class = CategorySerializer
+
+
+class AsyncSubcategoryView(AsyncCatalogView):
+    queryset = Subcategory.objects.select_related('category')
+    serializer_class = SubcategorySerializer
@@ -0,0 +1,145 @@
+import copy
+import time
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .caches import is_revocation_store_available, is_shared_cache
+from .constants import REVOCATION_STORE_UNAVAILABLE, TOKEN_REVOKED
+from .profiling import measure
+
+USER_VERSION_KEY = 'auth-user-version:{}'
+REVOKED_TOKEN_KEY = 'revoked-token:{}'
+
+
+class UserCache:
+    """
+    Кэш пользователей в памяти процесса. Запись живет timeout секунд и
+    помечена версией пользователя из общего кэша на момент загрузки:
+    после изменения пользователя в любом процессе версия меняется и
+    запись перестает использоваться.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._entries = {}
+        self._lock = Lock()
+
+    def get(self, user_id, version):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        user, entry_version, expires_at = entry
+        if entry_version != version or expires_at <= time.monotonic():
+            self.discard(user_id)
+            return None
+        return copy.copy(user)
+
+    def set(self, user_id, user, version):
+        timeout = (settings.AUTH_USER_CACHE_SECONDS
+                   if self.timeout is None else self.timeout)
+        with self._lock:
+            self._entries[user_id] = (copy.copy(user), version,
+                                      time.monotonic() + timeout)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def get_user_version(user_id):
+    """
+    Возвращает версию пользователя из общего кэша, инициализируя ее
+    текущим временем, как get_versions для моделей.
+    """
+    key = USER_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_user(user_id):
+    """Делает записи пользователя в кэшах всех процессов устаревшими."""
+    cache.set(USER_VERSION_KEY.format(user_id), time.time_ns(),
+              timeout=None)
+    user_cache.discard(user_id)
+
+
+def get_revocation_cache():
+    return caches[settings.REVOCATION_CACHE_ALIAS]
+
+
+def revoke_token(token):
+    """
+    Вносит токен в список отозванных до истечения его срока действия.
+    Список хранится в кэше REVOCATION_CACHE_ALIAS, который не вытесняет
+    записи, в отличие от кэша по умолчанию с ответами каталога.
+    """
+    timeout = max(int(token['exp'] - time.time()), 1)
+    get_revocation_cache().set(
+        REVOKED_TOKEN_KEY.format(token[api_settings.JTI_CLAIM]), True,
+        timeout)
+
+
+def is_token_revoked(token):
+    jti = token.get(api_settings.JTI_CLAIM)
+    return jti is not None and get_revocation_cache().get(
+        REVOKED_TOKEN_KEY.format(jti), False)
+
+
+class SarafanJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация проекта. Токен проверяется по списку отозванных,
+    пользователь берется из user_cache и загружается из базы, только
+    если записи нет или она устарела. Время проверки токена и загрузки
+    пользователя учитывается в профиле запроса как этап auth.
+
+    Список отозванных токенов хранится в отдельном кэше, общем для всех
+    процессов и не вытесняющем записи. Если такого кэша нет, отзыв мог
+    бы потеряться или остаться невидимым для других воркеров, поэтому
+    аутентификация по токену отклоняется. Версии пользователей хранятся
+    в кэше по умолчанию; если он в памяти процесса, user_cache не
+    используется.
+    """
+
+    def authenticate(self, request):
+        with measure('auth'):
+            return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        if not is_revocation_store_available():
+            raise AuthenticationFailed(REVOCATION_STORE_UNAVAILABLE,
+                                       code='revocation_store_unavailable')
+        validated_token = super().get_validated_token(raw_token)
+        if is_token_revoked(validated_token):
+            raise AuthenticationFailed(TOKEN_REVOKED, code='token_revoked')
+        return validated_token
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not is_shared_cache():
+            return super().get_user(validated_token)
+        version = get_user_version(user_id)
+        user = user_cache.get(user_id, version)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user, version)
+        elif api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            return super().get_user(validated_token)
+        return user
@@ -0,0 +1,167 @@
+import statistics
+from collections import namedtuple
+from http import HTTPStatus
+
+from django.test import Client
+from django.urls import URLResolver, reverse
+
+from .constants import CART_OPERATION_ADD, CART_OPERATION_REMOVE
+
+
+def percentile(values, percent):
+    """Возвращает перцентиль по методу ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1,
+                       round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    """
+    Сводит задержки запросов (в секундах) и общее время прогона в
+    метрики: p50/p95/p99 в миллисекундах и пропускную способность.
+    """
+    return {
+        'requests': len(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': (statistics.fmean(latencies) * 1000
+                    if latencies else 0.0),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def get_tokens(username, password):
+    """
+    Получает пару JWT через API, как клиент. Возвращает None, если
+    учетные данные не подошли.
+    """
+    response = Client().post(reverse('api:jwt-create'), {
+        'username': username, 'password': password})
+    if response.status_code != HTTPStatus.OK:
+        return None
+    return {'password': password, **response.json()}
+
+
+def format_summary(name, summary):
+    return (f'{name}: {summary["requests"]} запросов, '
+            f'{summary["rps"]:.1f} запр/с, '
+            f'p50 {summary["p50_ms"]:.2f} мс, '
+            f'p95 {summary["p95_ms"]:.2f} мс, '
+            f'p99 {summary["p99_ms"]:.2f} мс')
+
+
+LIST_PAGE_SIZE = 20
+
+Scenario = namedtuple(
+    'Scenario', ('route', 'method', 'kwargs', 'data', 'status', 'auth'),
+    defaults=(None, None, HTTPStatus.OK, False))
+
+# Маршруты, меняющие учетную запись пользователя или требующие писем и
+# одноразовых токенов: их нельзя повторять под нагрузкой. Отзыв токена
+# сделал бы недействительным токен прогона. Выгрузка каталога доступна
+# только администраторам и читает его целиком.
+EXCLUDED_ROUTES = frozenset((
+    'user-activation', 'user-resend-activation', 'user-reset-password',
+    'user-reset-password-confirm', 'user-reset-username',
+    'user-reset-username-confirm', 'user-set-password', 'user-set-username',
+    'jwt-revoke', 'products-export',
+))
+
+
+def get_route_names(patterns=None):
+    """Возвращает имена всех маршрутов api/urls.py, включая вложенные."""
+    if patterns is None:
+        from .urls import urlpatterns as patterns
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= get_route_names(pattern.url_patterns)
+        elif pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def build_scenarios(user, product, tokens):
+    """
+    Строит сценарии для всех маршрутов API. Пишущие сценарии
+    идемпотентны и упорядочены так, чтобы каждый запрос можно было
+    повторять: PUT меняет существующую строку корзины, пакет удаляет и
+    снова добавляет продукт, очистка корзины выполняется последней.
+    """
+    product_kwargs = {'pk': product.pk}
+    page = {'limit': LIST_PAGE_SIZE}
+    cart_kwargs = {'product_pk': product.pk}
+    batch = [
+        {'product': product.pk, 'operation': CART_OPERATION_REMOVE},
+        {'product': product.pk, 'operation': CART_OPERATION_ADD,
+         'amount': 1},
+    ]
+    return (
+        Scenario('api-root', 'get'),
+        Scenario('products-list', 'get', data=page),
+        Scenario('products-detail', 'get', product_kwargs),
+        Scenario('products-search', 'get',
+                 data={'q': product.name.split()[0]}),
+        Scenario('categories-list', 'get', data=page),
+        Scenario('categories-detail', 'get', {'pk': product.category_id}),
+        Scenario('categories-tree', 'get'),
+        Scenario('subcategories-list', 'get', data=page),
+        Scenario('subcategories-detail', 'get',
+                 {'pk': product.subcategory_id}),
+        Scenario('async-products-list', 'get', data=page),
+        Scenario('async-products-detail', 'get', product_kwargs),
+        Scenario('async-categories-list', 'get', data=page),
+        Scenario('async-categories-detail', 'get',
+                 {'pk': product.category_id}),
+        Scenario('async-subcategories-list', 'get', data=page),
+        Scenario('async-subcategories-detail', 'get',
+                 {'pk': product.subcategory_id}),
+        Scenario('schema-json', 'get', {'format': '.json'}),
+        Scenario('schema-swagger-ui', 'get'),
+        Scenario('jwt-create', 'post', data={
+            'username': user.username, 'password': tokens['password']}),
+        Scenario('jwt-refresh', 'post', data={'refresh': tokens['refresh']}),
+        Scenario('jwt-verify', 'post', data={'token': tokens['access']}),
+        Scenario('user-list', 'get', auth=True),
+        Scenario('user-me', 'get', auth=True),
+        Scenario('user-detail', 'get', {'id': user.pk}, auth=True),
+        Scenario('shopping-cart-info-get-shopping-cart', 'get', auth=True),
+        Scenario('shopping-cart-info-get-summary', 'get', auth=True),
+        Scenario('shopping-cart', 'put', cart_kwargs, {'amount': 2},
+                 auth=True),
+        Scenario('shopping-cart-batch', 'post', data=batch, auth=True),
+        Scenario('shopping-cart', 'delete', cart_kwargs,
+                 status=HTTPStatus.NO_CONTENT, auth=True),
+        Scenario('clear-shopping-cart', 'delete',
+                 status=HTTPStatus.NO_CONTENT, auth=True),
+    )
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Сравнивает результаты прогона с сохраненной базой и возвращает
+    список регрессий: рост p95 или падение пропускной способности больше
+    чем на долю tolerance и любой рост числа запросов к базе.
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {result["p95_ms"]:.2f} мс, база '
+                f'{expected["p95_ms"]:.2f} мс')
+        if result['rps'] < expected['rps'] * (1 - tolerance):
+            regressions.append(
+                f'{name}: {result["rps"]:.1f} запр/с, база '
+                f'{expected["rps"]:.1f} запр/с')
+        if result['queries'] > expected['queries']:
+            regressions.append(
+                f'{name}: {result["queries"]} запросов к БД, база '
+                f'{expected["queries"]}')
+    return regressions
@@ -0,0 +1,61 @@
+import sys
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+
+from .constants import (REVOCATION_STORE_HINT, REVOCATION_STORE_UNAVAILABLE,
+                        SHARED_CACHE_HINT, SHARED_CACHE_REQUIRED)
+
+
+def is_shared_cache(alias=DEFAULT_CACHE_ALIAS):
+    """
+    Проверяет, что кэш виден всем процессам. Запись в LocMemCache видна
+    только записавшему процессу, поэтому версии моделей и отозванные
+    токены в нем не доходят до остальных воркеров.
+    """
+    return not isinstance(caches[alias], LocMemCache)
+
+
+def is_evicting_cache(alias=DEFAULT_CACHE_ALIAS):
+    """
+    Проверяет, что кэш может удалить запись до истечения ее срока:
+    memcached вытесняет давно не читанные записи, файловый кэш и кэш в
+    базе при превышении MAX_ENTRIES удаляют часть записей. Политику
+    вытеснения Redis проверить нельзя, она задается на сервере.
+    """
+    backend = caches[alias]
+    if isinstance(backend, BaseMemcachedCache):
+        return True
+    if isinstance(backend, RedisCache):
+        return False
+    return backend._max_entries < sys.maxsize
+
+
+def is_revocation_store_available():
+    """
+    Проверяет, что кэш отозванных токенов задан, общий для процессов и
+    не теряет записи до истечения срока.
+    """
+    alias = settings.REVOCATION_CACHE_ALIAS
+    return (alias in settings.CACHES and is_shared_cache(alias)
+            and not is_evicting_cache(alias))
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Кэш ответов без общего кэша и аутентификация по токену без
+    надежного списка отозванных токенов запрещены (api.E001).
+    """
+    errors = []
+    if settings.RESPONSE_CACHE_ENABLED and not is_shared_cache():
+        errors.append(checks.Error(SHARED_CACHE_REQUIRED,
+                                   hint=SHARED_CACHE_HINT, id='api.E001'))
+    if not is_revocation_store_available():
+        errors.append(checks.Error(REVOCATION_STORE_UNAVAILABLE,
+                                   hint=REVOCATION_STORE_HINT, id='api.E001'))
+    return errors
@@ -0,0 +1,94 @@
+import time
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from product.models import ShoppingCart
+
+CART_SUMMARY_KEY = 'cart-summary:{}:{}'
+CART_VERSION_KEY = 'cart-summary-version:{}'
+
+
+def get_version(user_id):
+    """
+    Возвращает версию итогов корзины пользователя, инициализируя ее
+    текущим временем, как get_user_version для пользователей.
+    """
+    key = CART_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_key(user_id, version=None):
+    if version is None:
+        version = get_version(user_id)
+    return CART_SUMMARY_KEY.format(user_id, version)
+
+
+def set_lines(user_id, lines, version):
+    """
+    Сохраняет строки под версией, прочитанной до чтения корзины из базы:
+    если корзина за это время изменилась, версия уже сменилась и
+    устаревшие строки недостижимы.
+    """
+    cache.set(get_key(user_id, version), lines, settings.CART_SUMMARY_TIMEOUT)
+
+
+def build_lines(user_id):
+    """
+    Собирает строки корзины пользователя вида
+    {product_id: (amount, price)} одним запросом и сохраняет их в кэш.
+    """
+    version = get_version(user_id)
+    lines = {product_id: (amount, price) for product_id, amount, price in
+             ShoppingCart.objects.filter(
+                 user_id=user_id, is_in_shopping_cart=True
+             ).order_by().values_list('product_id', 'amount',
+                                      'product__price')}
+    set_lines(user_id, lines, version)
+    return lines
+
+
+def get_summary(user_id):
+    """
+    Возвращает итоги корзины: общее кол-во товаров, общую стоимость и
+    число позиций. Пока строки текущей версии есть в кэше, база не
+    используется.
+    """
+    lines = cache.get(get_key(user_id))
+    if lines is None:
+        lines = build_lines(user_id)
+    return {
+        'total_items': sum(amount for amount, _ in lines.values()),
+        'total_price': sum((amount * price for amount, price
+                            in lines.values()), Decimal(0)),
+        'lines': len(lines),
+    }
+
+
+def invalidate(user_ids):
+    """
+    Меняет версии итогов корзин пользователей: строки прежних версий
+    больше не читаются и истекают через CART_SUMMARY_TIMEOUT. Смена
+    версии не зависит от чтения записи, поэтому параллельные изменения
+    корзины не теряют друг друга.
+    """
+    version = time.time_ns()
+    cache.set_many({CART_VERSION_KEY.format(user_id): version
+                    for user_id in user_ids}, timeout=None)
+
+
+def invalidate_on_commit(user_ids):
+    """
+    Сбрасывает итоги сразу и еще раз после фиксации транзакции, чтобы
+    параллельный запрос не закэшировал прочитанную до фиксации корзину.
+    """
+    user_ids = list(user_ids)
+    invalidate(user_ids)
+    transaction.on_commit(partial(invalidate, user_ids))
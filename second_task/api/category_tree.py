@@ -0,0 +1,69 @@
+import time
+from threading import Lock
+
+from django.conf import settings
+
+from category.models import Category, Subcategory
+from .versions import get_versions
+
+
+class CategoryTreeSnapshot:
+    """
+    Снимок дерева категорий и подкатегорий, хранящийся в памяти процесса.
+    Снимок помечается версиями моделей Category и Subcategory из общего
+    кэша и перестраивается, когда одна из версий изменилась в любом
+    процессе или снимок старше CATEGORY_TREE_MAX_AGE секунд.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._tree = None
+        self._expires_at = 0
+
+    @staticmethod
+    def get_image_url(image):
+        return image.url if image else None
+
+    def build(self):
+        subcategories = {}
+        for subcategory in Subcategory.objects.only(
+                'id', 'title', 'slug', 'image', 'category_id'):
+            subcategories.setdefault(subcategory.category_id, []).append({
+                'id': subcategory.id,
+                'title': subcategory.title,
+                'slug': subcategory.slug,
+                'image': self.get_image_url(subcategory.image),
+            })
+        return [{
+            'id': category.id,
+            'title': category.title,
+            'slug': category.slug,
+            'image': self.get_image_url(category.image),
+            'subcategories': subcategories.get(category.id, []),
+        } for category in Category.objects.only(
+            'id', 'title', 'slug', 'image')]
+
+    def is_expired(self):
+        return self._expires_at <= time.monotonic()
+
+    def rebuild(self):
+        with self._lock:
+            version = get_versions(Category, Subcategory)
+            if version != self._version or self.is_expired():
+                self._tree = self.build()
+                self._version = version
+                self._expires_at = (time.monotonic()
+                                    + settings.CATEGORY_TREE_MAX_AGE)
+            return self._version, self._tree
+
+    def get(self):
+        """Возвращает пару (версия, дерево), перестраивая устаревший снимок."""
+        version, tree = self._version, self._tree
+        if (version is None or self.is_expired()
+                or version != get_versions(Category, Subcategory)):
+            return self.rebuild()
+        return version, tree
+
+
+category_tree = CategoryTreeSnapshot()
@@ -0,0 +1,56 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .constants import CART_VERSION_CONFLICT
+
+# Нарушение уникальности, сбой сериализации и взаимная блокировка в
+# PostgreSQL.
+TRANSIENT_SQLSTATES = frozenset(('23505', '40001', '40P01'))
+TRANSIENT_MESSAGES = ('UNIQUE constraint failed', 'database is locked')
+
+
+class VersionConflict(Exception):
+    """Строку изменил другой запрос после того, как она была прочитана."""
+
+
+class CartVersionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = CART_VERSION_CONFLICT
+    default_code = 'version_conflict'
+
+
+def is_transient(error):
+    """
+    Проверяет, что ошибка вызвана параллельной записью и повтор операции
+    с перечитанными данными может пройти.
+    """
+    if isinstance(error, VersionConflict):
+        return True
+    cause = error.__cause__
+    code = getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+    return code in TRANSIENT_SQLSTATES or any(
+        message in str(error) for message in TRANSIENT_MESSAGES)
+
+
+def retry_on_conflict(func, *args, **kwargs):
+    """
+    Выполняет func и повторяет ее с экспоненциальной задержкой со
+    случайным разбросом, пока она падает из-за конфликта с параллельной
+    записью, но не больше CART_WRITE_RETRIES раз. func должна сама
+    перечитывать данные и выполнять записи в своем блоке atomic, чтобы
+    неудачная попытка откатывалась целиком.
+    """
+    for attempt in range(settings.CART_WRITE_RETRIES + 1):
+        try:
+            return func(*args, **kwargs)
+        except (VersionConflict, IntegrityError, OperationalError) as error:
+            if attempt == settings.CART_WRITE_RETRIES or not is_transient(
+                    error):
+                raise
+        time.sleep(random.uniform(
+            0, settings.CART_RETRY_BACKOFF * 2 ** attempt))
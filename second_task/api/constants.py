@@ -1,3 +1,5 @@
+from http import HTTPStatus
+
 ALREADY_IN_SHOPPING_CART = {
     'errors': 'Уже добавлено в корзину. Используйте медот PUT для того, '
               'чтобы поменять кол-во.'
@@ -5,7 +7,46 @@ ALREADY_IN_SHOPPING_CART = {
 NOT_IN_SHOPPING_CART = {
     'errors': 'Этого товара нет в корзине.'
 }
+PRODUCT_NOT_FOUND = {'errors': 'Такого товара не существует.'}
+AMOUNT_REQUIRED = {'amount': 'Укажите кол-во для операций add и set.'}
 SUCCESS_MESSAGE = {'success': 'Удалены товар/товары'}
+NOT_FOUND = {'detail': 'Не найдено.'}
+SEARCH_QUERY_REQUIRED = {'q': 'Укажите поисковый запрос.'}
+INVALID_CURSOR = 'Некорректный курсор пагинации.'
+INVALID_COUNT_MODE = 'Допустимые значения: exact, estimate, none.'
+SHARED_CACHE_REQUIRED = ('Кэш ответов каталога требует кэша, общего для '
+                         'всех процессов.')
+REVOCATION_STORE_UNAVAILABLE = ('Список отозванных токенов недоступен: кэш '
+                                'не общий для процессов или вытесняет '
+                                'записи.')
+REVOCATION_STORE_HINT = ('Задайте кэш REVOCATION_CACHE_ALIAS без '
+                         'вытеснения: файловый с MAX_ENTRIES=sys.maxsize '
+                         'или Redis с maxmemory-policy noeviction.')
+SHARED_CACHE_HINT = ('Задайте CACHE_URL или CACHE_DIR либо отключите '
+                     'RESPONSE_CACHE_ENABLED.')
+UNKNOWN_FIELDS = 'Неизвестные поля: {}.'
+NO_FIELDS = 'Не выбрано ни одного поля.'
+IMAGE_TOO_LARGE = 'Размер изображения превышает {} байт.'
+TOKEN_REVOKED = 'Токен отозван.'
+CART_VERSION_CONFLICT = ('Строку корзины изменил другой запрос, '
+                         'перечитайте корзину и повторите.')
+SERVICE_OVERLOADED = {'detail': 'Сервис перегружен, повторите запрос позже.'}
+PRODUCT_IMAGES_REQUIRED = {
+    'image': 'Передайте исходное изображение image или все три размера: '
+             'thumbnail, medium и large.'
+}
+
+CART_OPERATION_ADD = 'add'
+CART_OPERATION_SET = 'set'
+CART_OPERATION_REMOVE = 'remove'
+CART_OPERATIONS = (CART_OPERATION_ADD, CART_OPERATION_SET,
+                   CART_OPERATION_REMOVE)
+CART_OPERATION_STATUSES = {
+    CART_OPERATION_ADD: HTTPStatus.CREATED,
+    CART_OPERATION_SET: HTTPStatus.OK,
+    CART_OPERATION_REMOVE: HTTPStatus.NO_CONTENT,
+}
+CART_BATCH_MAX_SIZE = 100
 
 CATEGORY_TESTS = {'title': 'Электроника', 'slug': 'electronics'}
 SUBCATEGORY_TESTS = {'title': 'Электроника', 'slug': 'electronics'}
@@ -18,3 +59,22 @@ PUT_SHOPPING_CART = {'amount': 200}
 
 USER_CREDS = {'username': 'test_user'}
 
+QUERY_BUDGETS = {'products': 1, 'categories': 2, 'subcategories': 1}
+COUNT_QUERY = 1
+ESTIMATE_QUERY = 1
+AUTH_QUERY = 1
+QUERY_BUDGET_PRODUCTS = 10
+STALE_ESTIMATE_EXTRA = 5
+BASE64_UPLOAD_CHUNKS = 8
+QUERY_BUDGET_PAGE_LIMIT = 100
+CURSOR_PAGE_SIZE = 2
+CART_WRITE_QUERIES = 2
+CART_BATCH_QUERIES = 6
+BENCHMARK_PRODUCTS = 30
+BENCHMARK_USERS = 3
+BENCHMARK_CART_ROWS = 20
+PROFILING_STORE_MAX_FILES = 2
+IMPORT_BATCH_SIZE = 2
+THROTTLE_RATES = {'catalog': '2/m', 'cart': '1/m'}
+THROTTLE_BURSTS = {'catalog': 2, 'cart': 1}
+ADMIN_CHANGELIST_QUERIES = 6
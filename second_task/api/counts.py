@@ -0,0 +1,139 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+from .versions import get_versions
+
+COUNT_CACHE_KEY = 'list-count:{}'
+COUNT_SIZE_KEY = 'list-count-size:{}'
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+COUNT_MODES = (COUNT_EXACT, COUNT_ESTIMATE, COUNT_NONE)
+
+
+def is_unfiltered(queryset):
+    """
+    Проверяет, что queryset выбирает все строки таблицы модели и их
+    число совпадает с размером таблицы.
+    """
+    query = queryset.query
+    return not (query.where or query.is_sliced or query.combinator
+                or query.distinct or query.extra_tables
+                or query.group_by is not None)
+
+
+def estimate_count(queryset):
+    """
+    Возвращает оценку числа строк queryset по статистике СУБД без
+    COUNT(*) или None, если оценки нет. На PostgreSQL берется оценка
+    планировщика из EXPLAIN, на SQLite — размер таблицы из sqlite_stat1
+    (появляется после ANALYZE) и только для запроса без условий.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.get_compiler(
+            queryset.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    if connection.vendor == 'sqlite' and is_unfiltered(queryset):
+        # Первое число stat — строки в индексе; у частичных индексов их
+        # меньше, чем в таблице, поэтому берется максимум.
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 '
+                    'WHERE tbl = %s', [queryset.model._meta.db_table])
+                return cursor.fetchone()[0]
+        except DatabaseError:
+            return None
+    return None
+
+
+def estimate_large_count(queryset):
+    """
+    Возвращает оценку числа строк, если она не меньше
+    COUNT_ESTIMATE_THRESHOLD. Для небольших выборок и запросов без оценки
+    возвращает None: их дешевле посчитать точно.
+    """
+    estimate = estimate_count(queryset)
+    threshold = settings.COUNT_ESTIMATE_THRESHOLD
+    if estimate is not None and estimate >= threshold:
+        return estimate
+    return None
+
+
+def get_count_cache_keys(queryset, dependencies=()):
+    """
+    Строит ключи числа строк из модели и условий выборки: первый ключ
+    включает версии модели и dependencies, второй от версий не зависит
+    и хранит последнее точное число строк выборки. Список колонок и
+    сортировка на число строк не влияют и в ключи не входят.
+    """
+    sql, params = queryset.order_by().values('pk').query.get_compiler(
+        queryset.db).as_sql()
+    signature = '|'.join((
+        queryset.model._meta.label_lower,
+        sql,
+        repr(params),
+    ))
+    versions = repr(get_versions(queryset.model, *dependencies))
+    return (
+        COUNT_CACHE_KEY.format(hashlib.sha1(
+            f'{signature}|{versions}'.encode()).hexdigest()),
+        COUNT_SIZE_KEY.format(hashlib.sha1(signature.encode()).hexdigest()),
+    )
+
+
+def get_count(queryset, mode=COUNT_ESTIMATE, dependencies=()):
+    """
+    Возвращает число строк queryset из кэша, а при промахе считает его и
+    кэширует до изменения модели или dependencies. В режиме estimate
+    большие выборки не считаются COUNT(*), вместо этого кэшируется
+    оценка по статистике СУБД. Если прошлое точное число строк выборки
+    было меньше COUNT_ESTIMATE_THRESHOLD, статистика не запрашивается:
+    после изменения модели небольшая выборка пересчитывается одним
+    запросом. Режим exact всегда возвращает точное число и не использует
+    закэшированную оценку.
+    """
+    key, size_key = get_count_cache_keys(queryset, dependencies)
+    cached = cache.get_many((key, size_key))
+    if key in cached:
+        count, exact = cached[key]
+        if exact or mode == COUNT_ESTIMATE:
+            return count
+    count = None
+    if mode == COUNT_ESTIMATE and cached.get(
+            size_key, settings.COUNT_ESTIMATE_THRESHOLD
+    ) >= settings.COUNT_ESTIMATE_THRESHOLD:
+        count = estimate_large_count(queryset)
+    exact = count is None
+    if exact:
+        count = queryset.count()
+        cache.set(size_key, count, settings.COUNT_CACHE_TIMEOUT)
+    cache.set(key, (count, exact), settings.COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки для больших таблиц: если оценка числа строк не
+    меньше COUNT_ESTIMATE_THRESHOLD, она используется вместо COUNT(*).
+    Оценка приблизительна, поэтому последние страницы списка могут
+    оказаться пустыми или недоступными. Небольшие таблицы и запросы без
+    оценки считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_large_count(self.object_list)
+        return super().count if estimate is None else estimate
@@ -0,0 +1,115 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PRIMARY_PIN_KEY = 'primary-pin:{}'
+REPLICATED_MODELS = frozenset(('product.product', 'category.category',
+                               'category.subcategory'))
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def use_replicas():
+    """Разрешает чтение каталога с реплик внутри блока."""
+    token = replica_reads.set(True)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Запрещает чтение с реплик внутри блока."""
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def pin_to_primary(user):
+    """
+    Закрепляет чтения пользователя за основной базой на
+    PRIMARY_PIN_SECONDS после записи, чтобы он видел свои изменения
+    несмотря на отставание реплик.
+    """
+    cache.set(PRIMARY_PIN_KEY.format(user.pk), True,
+              settings.PRIMARY_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return (user.is_authenticated
+            and cache.get(PRIMARY_PIN_KEY.format(user.pk), False))
+
+
+class ReadReplicaRouter:
+    """
+    Отправляет чтения Product, Category и Subcategory на реплики по
+    кругу, если чтение идет внутри use_replicas(). Реплика, к которой не
+    удалось подключиться, исключается на REPLICA_RETRY_SECONDS; если
+    здоровых реплик нет, чтение уходит в основную базу. Записи и
+    миграции всегда выполняются в основной базе.
+    """
+
+    def __init__(self, replicas=None, retry_seconds=None):
+        self.replicas = tuple(settings.REPLICA_DATABASES
+                              if replicas is None else replicas)
+        self.retry_seconds = (settings.REPLICA_RETRY_SECONDS
+                              if retry_seconds is None else retry_seconds)
+        self._counter = count()
+        self._unhealthy = {}
+        self._lock = Lock()
+
+    def check_health(self, alias):
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            return False
+        return True
+
+    def is_available(self, alias):
+        retry_at = self._unhealthy.get(alias)
+        if retry_at is not None and retry_at > time.monotonic():
+            return False
+        if self.check_health(alias):
+            self._unhealthy.pop(alias, None)
+            return True
+        with self._lock:
+            self._unhealthy[alias] = time.monotonic() + self.retry_seconds
+        return False
+
+    def get_replica(self):
+        start = next(self._counter)
+        for offset in range(len(self.replicas)):
+            alias = self.replicas[(start + offset) % len(self.replicas)]
+            if self.is_available(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        if (self.replicas and replica_reads.get()
+                and model._meta.label_lower in REPLICATED_MODELS):
+            return self.get_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *self.replicas}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in self.replicas:
+            return False
+        return None
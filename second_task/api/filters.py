@@ -0,0 +1,52 @@
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+class ProductFilterSerializer(serializers.Serializer):
+    """
+    Сериализатор параметров фильтрации продуктов.
+    """
+
+    category = serializers.IntegerField(min_value=1, required=False)
+    subcategory = serializers.IntegerField(min_value=1, required=False)
+    price_min = serializers.DecimalField(max_digits=10, decimal_places=2,
+                                         required=False)
+    price_max = serializers.DecimalField(max_digits=10, decimal_places=2,
+                                         required=False)
+
+
+class ProductFilterBackend(BaseFilterBackend):
+    """
+    Фильтрует продукты по категории, подкатегории и диапазону цены из
+    параметров запроса.
+    """
+
+    lookups = {
+        'category': 'category_id',
+        'subcategory': 'subcategory_id',
+        'price_min': 'price__gte',
+        'price_max': 'price__lte',
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        params = ProductFilterSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return queryset.filter(**{
+            self.lookups[name]: value
+            for name, value in params.validated_data.items()})
+
+
+class SarafanOrderingFilter(OrderingFilter):
+    """
+    Сортировка по параметру ordering с добавлением id в том же
+    направлении, чтобы порядок был однозначным при равных значениях.
+    Такой порядок покрывается составными индексами, которые в SQLite
+    неявно заканчиваются rowid.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        descending = ordering[-1].startswith('-')
+        return [*ordering, '-id' if descending else 'id']
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api import cart_summary
+from api.benchmarks import (EXCLUDED_ROUTES, build_scenarios,
+                            compare_to_baseline, format_summary,
+                            get_route_names, get_tokens, summarize)
+from product.models import Product, ShoppingCart
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все маршруты API через тестовый клиент Django с '
+            'заданной конкурентностью и сравнивает p50/p95/p99, число '
+            'запросов к БД и пропускную способность с сохраненной базой.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на каждый сценарий.')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--route', action='append', default=[],
+                            help='Прогнать только указанные маршруты.')
+        parser.add_argument('--username', default='synthetic-user-0')
+        parser.add_argument('--password', default='benchmark-pass')
+        parser.add_argument('--baseline', default=settings.BENCHMARK_BASELINE)
+        parser.add_argument('--save-baseline', action='store_true')
+        parser.add_argument('--tolerance', type=float,
+                            default=settings.BENCHMARK_TOLERANCE)
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Отключить кэш ответов каталога.')
+
+    def prepare(self, username, password):
+        """
+        Находит пользователя и продукт для сценариев и кладет продукт в
+        корзину, чтобы пишущие сценарии начинались с известного
+        состояния.
+        """
+        user = User.objects.filter(username=username).first()
+        product = Product.objects.order_by('pk').first()
+        if user is None or product is None:
+            raise CommandError('Нет данных для прогона, выполните '
+                               'generate_synthetic_data.')
+        ShoppingCart.objects.update_or_create(
+            user=user, product=product,
+            defaults={'amount': 1, 'is_in_shopping_cart': True})
+        cart_summary.invalidate([user.pk])
+        tokens = get_tokens(username, password)
+        if tokens is None:
+            raise CommandError(f'Не удалось получить токен для {username}.')
+        return user, product, tokens
+
+    def run_scenario(self, scenario, headers, concurrency, total, warmup):
+        url = reverse(f'api:{scenario.route}', kwargs=scenario.kwargs)
+        local = threading.local()
+
+        def request(_):
+            if not hasattr(local, 'client'):
+                local.client = Client(
+                    raise_request_exception=False,
+                    headers=headers if scenario.auth else None)
+            method = getattr(local.client, scenario.method)
+            options = ({} if scenario.method == 'get'
+                       else {'content_type': 'application/json'})
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = method(url, scenario.data, **options)
+                latency = time.perf_counter() - started
+            return (latency, len(queries),
+                    response.status_code == scenario.status)
+
+        for index in range(warmup):
+            request(index)
+        started = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(concurrency) as executor:
+                samples = list(executor.map(request, range(total)))
+        else:
+            samples = [request(index) for index in range(total)]
+        elapsed = time.perf_counter() - started
+        latencies, queries, succeeded = zip(*samples)
+        return {**summarize(latencies, elapsed),
+                'queries': max(queries),
+                'errors': succeeded.count(False)}
+
+    def handle(self, *args, concurrency, requests, warmup, route, username,
+               password, baseline, save_baseline, tolerance, no_cache,
+               **options):
+        run = {'concurrency': concurrency, 'requests': requests,
+               'no_cache': no_cache}
+        stored = None
+        if not save_baseline and os.path.exists(baseline):
+            with open(baseline) as file:
+                stored = json.load(file)
+            if any(stored.get(key) != value for key, value in run.items()):
+                raise CommandError(
+                    f'База {baseline} снята с другими параметрами прогона.')
+        # Прогон измеряет стоимость запросов, а не лимиты клиента.
+        overrides = {'THROTTLE_ENABLED': False}
+        if no_cache:
+            overrides['CATALOG_CACHE_TIMEOUT'] = 0
+        with override_settings(ALLOWED_HOSTS=['testserver'], **overrides):
+            user, product, tokens = self.prepare(username, password)
+            scenarios = build_scenarios(user, product, tokens)
+            missing = (get_route_names() - EXCLUDED_ROUTES
+                       - {scenario.route for scenario in scenarios})
+            if missing:
+                raise CommandError(
+                    f'Нет сценариев для маршрутов: {sorted(missing)}')
+            headers = {'Authorization': f'Bearer {tokens["access"]}'}
+            self.stdout.write(f'Конкурентность: {concurrency}, '
+                              f'запросов на сценарий: {requests}')
+            results = {}
+            for scenario in scenarios:
+                if route and scenario.route not in route:
+                    continue
+                name = f'{scenario.method.upper()} {scenario.route}'
+                result = self.run_scenario(scenario, headers, concurrency,
+                                           requests, warmup)
+                results[name] = result
+                self.stdout.write(
+                    f'{format_summary(name, result)}, '
+                    f'{result["queries"]} запросов к БД, '
+                    f'ошибок: {result["errors"]}')
+
+        failures = [f'{name}: ошибок {result["errors"]}'
+                    for name, result in results.items() if result['errors']]
+        if save_baseline:
+            os.makedirs(os.path.dirname(baseline) or '.', exist_ok=True)
+            with open(baseline, 'w') as file:
+                json.dump({**run, 'results': results}, file, indent=2,
+                          sort_keys=True)
+            self.stdout.write(f'База сохранена в {baseline}')
+        elif stored is not None:
+            failures += compare_to_baseline(
+                results, stored['results'], tolerance)
+        if failures:
+            raise CommandError('Регрессии:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from api.benchmarks import format_summary, summarize
+
+RESOURCES = ('products', 'categories', 'subcategories')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает синхронные (WSGI) и асинхронные (ASGI) '
+            'эндпоинты каталога при фиксированной конкурентности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resource', choices=RESOURCES,
+                            default='products')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--limit', type=int, default=20)
+
+    def run_sync(self, url, data, concurrency, total):
+        client = Client()
+
+        def request(_):
+            started = time.perf_counter()
+            response = client.get(url, data)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: {response.status_code}')
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            latencies = list(executor.map(request, range(total)))
+        return summarize(latencies, time.perf_counter() - started)
+
+    async def run_async(self, url, data, concurrency, total):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url, data)
+                if response.status_code != 200:
+                    raise CommandError(f'{url}: {response.status_code}')
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(request() for _ in range(total)))
+        return summarize(latencies, time.perf_counter() - started)
+
+    @override_settings(ALLOWED_HOSTS=['testserver'], CATALOG_CACHE_TIMEOUT=0)
+    def handle(self, *args, resource, concurrency, requests, limit,
+               **options):
+        data = {'limit': limit}
+        sync_url = reverse(f'api:{resource}-list')
+        async_url = reverse(f'api:async-{resource}-list')
+        self.stdout.write(f'Конкурентность: {concurrency}, '
+                          f'запросов: {requests}, limit: {limit}')
+        sync = self.run_sync(sync_url, data, concurrency, requests)
+        self.stdout.write(format_summary(f'WSGI sync  {sync_url}', sync))
+        result = asyncio.run(
+            self.run_async(async_url, data, concurrency, requests))
+        self.stdout.write(format_summary(f'ASGI async {async_url}', result))
+        self.stdout.write(self.style.SUCCESS(
+            f'async/sync по пропускной способности: '
+            f'{result["rps"] / sync["rps"]:.2f}x'))
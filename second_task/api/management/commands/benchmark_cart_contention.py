@@ -0,0 +1,135 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from api import cart_summary
+from api.benchmarks import format_summary, get_tokens, summarize
+from api.constants import CART_OPERATION_SET
+from product.models import Product, ShoppingCart
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Нагружает одну корзину записями из нескольких потоков и '
+            'проверяет, что нет ошибок и потерянных обновлений.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Итераций записи в каждом потоке.')
+        parser.add_argument('--username', default='synthetic-user-0')
+        parser.add_argument('--password', default='benchmark-pass')
+
+    def prepare(self, username, threads):
+        """
+        Кладет в корзину общий продукт, который меняют все потоки, и по
+        продукту на поток. Возвращает пользователя, продукты и версии
+        строк до прогона.
+        """
+        user = User.objects.filter(username=username).first()
+        products = list(Product.objects.order_by('pk')[:threads + 1])
+        if user is None or len(products) <= threads:
+            raise CommandError('Нет данных для прогона, выполните '
+                               'generate_synthetic_data.')
+        for product in products:
+            ShoppingCart.objects.update_or_create(
+                user=user, product=product,
+                defaults={'amount': 1, 'is_in_shopping_cart': True})
+        cart_summary.invalidate([user.pk])
+        return user, products, self.get_versions(user, products)
+
+    @staticmethod
+    def get_versions(user, products):
+        return dict(ShoppingCart.objects.filter(
+            user=user, product__in=products
+        ).values_list('product_id', 'version'))
+
+    def run(self, headers, shared, own_products, iterations):
+        """
+        Каждый поток меняет кол-во общего продукта PUT-запросом и пакетом
+        вместе со своим продуктом. Возвращает задержки запросов и число
+        неожиданных ответов.
+        """
+        local = threading.local()
+        batch_url = reverse('api:shopping-cart-batch')
+        shared_url = reverse('api:shopping-cart',
+                             kwargs={'product_pk': shared.pk})
+
+        def worker(own):
+            if not hasattr(local, 'client'):
+                local.client = Client(raise_request_exception=False,
+                                      headers=headers)
+            latencies, errors = [], 0
+            for amount in range(1, iterations + 1):
+                started = time.perf_counter()
+                response = local.client.put(
+                    shared_url, {'amount': amount},
+                    content_type='application/json')
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != HTTPStatus.OK
+
+                started = time.perf_counter()
+                response = local.client.post(batch_url, [
+                    {'product': product.pk, 'operation': CART_OPERATION_SET,
+                     'amount': amount} for product in (shared, own)
+                ], content_type='application/json')
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != HTTPStatus.OK or any(
+                    result['status'] != HTTPStatus.OK
+                    for result in response.json())
+            return latencies, errors
+
+        if len(own_products) > 1:
+            with ThreadPoolExecutor(len(own_products)) as executor:
+                results = list(executor.map(worker, own_products))
+        else:
+            results = [worker(own) for own in own_products]
+        return ([latency for latencies, _ in results
+                 for latency in latencies],
+                sum(errors for _, errors in results))
+
+    def handle(self, *args, threads, iterations, username, password,
+               **options):
+        with override_settings(ALLOWED_HOSTS=['testserver'],
+                               THROTTLE_ENABLED=False):
+            user, products, before = self.prepare(username, threads)
+            tokens = get_tokens(username, password)
+            if tokens is None:
+                raise CommandError(
+                    f'Не удалось получить токен для {username}.')
+            shared, own_products = products[0], products[1:]
+            started = time.perf_counter()
+            latencies, errors = self.run(
+                {'Authorization': f'Bearer {tokens["access"]}'}, shared,
+                own_products, iterations)
+            elapsed = time.perf_counter() - started
+
+        after = self.get_versions(user, products)
+        amounts = dict(ShoppingCart.objects.filter(
+            user=user, product__in=own_products
+        ).values_list('product_id', 'amount'))
+        # Каждая успешная запись увеличивает версию строки ровно на один,
+        # поэтому без потерь прирост версии равен числу записей.
+        writes = {shared.pk: threads * iterations * 2,
+                  **dict.fromkeys(amounts, iterations)}
+        lost = {product_id: count - (after[product_id] - before[product_id])
+                for product_id, count in writes.items()
+                if after[product_id] - before[product_id] != count}
+        lost.update({product_id: iterations - amount for product_id, amount
+                     in amounts.items() if amount != iterations})
+        summary = format_summary('Запись корзины',
+                                 summarize(latencies, elapsed))
+        self.stdout.write(f'Потоков: {threads}, итераций: {iterations}')
+        self.stdout.write(f'{summary}, ошибок: {errors}')
+        if errors or lost:
+            raise CommandError(f'Ошибок: {errors}, потеряно обновлений по '
+                               f'продуктам: {lost}')
+        self.stdout.write(self.style.SUCCESS(
+            'Ошибок и потерянных обновлений нет.'))
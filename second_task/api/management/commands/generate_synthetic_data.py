@@ -0,0 +1,140 @@
+import random
+import time
+from array import array
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.versions import bump_version
+from category.models import Category, Subcategory
+from product.models import Product, ShoppingCart
+from product.renditions import IMAGE_FIELDS
+
+User = get_user_model()
+
+ADJECTIVES = ('Красный', 'Быстрый', 'Легкий', 'Умный', 'Тихий', 'Новый',
+              'Компактный', 'Мощный', 'Классический', 'Беспроводной')
+NOUNS = ('телефон', 'ноутбук', 'чайник', 'рюкзак', 'фонарь', 'наушники',
+         'кресло', 'монитор', 'велосипед', 'часы', 'планшет', 'пылесос')
+PLACEHOLDER_IMAGE = '{}/synthetic.jpg'
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Генерирует синтетический каталог, пользователей и корзины '
+            'заданного размера пакетными вставками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--subcategories', type=int, default=10,
+                            help='Подкатегорий в каждой категории.')
+        parser.add_argument('--products', type=int, default=10_000)
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--cart-rows', type=int, default=50_000)
+        parser.add_argument(
+            '--inactive-ratio', type=float, default=0.2,
+            help='Доля удаленных из корзины (неактивных) строк.')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='synthetic',
+            help='Префикс слагов и имен пользователей.')
+        parser.add_argument('--password', default='benchmark-pass',
+                            help='Пароль всех сгенерированных '
+                                 'пользователей.')
+
+    def bulk_create(self, model, objects, total, batch_size):
+        """
+        Вставляет объекты пачками в отдельных транзакциях, не держа весь
+        набор в памяти, и возвращает первичные ключи созданных строк.
+        """
+        pks = array('q')
+        created = 0
+        for batch in batched(objects, batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            pks.extend(obj.pk for obj in batch if obj.pk is not None)
+            created += len(batch)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {created}/{total}',
+                ending='\r')
+        self.stdout.write('')
+        return pks
+
+    def handle(self, *args, categories, subcategories, products, users,
+               cart_rows, inactive_ratio, batch_size, seed, prefix, password,
+               **options):
+        if Category.objects.filter(slug__startswith=f'{prefix}-').exists():
+            raise CommandError(
+                f'Данные с префиксом {prefix} уже есть, укажите --prefix.')
+        if cart_rows > users * products:
+            raise CommandError('Строк корзины больше, чем пар '
+                               'пользователь-продукт.')
+        rng = random.Random(seed)
+        started = time.perf_counter()
+
+        category_objects = [Category(
+            title=f'Категория {i}', slug=f'{prefix}-category-{i}',
+            image=PLACEHOLDER_IMAGE.format('categories')
+        ) for i in range(categories)]
+        self.bulk_create(Category, category_objects, categories, batch_size)
+        subcategory_objects = [Subcategory(
+            title=f'Подкатегория {i}-{j}',
+            slug=f'{prefix}-subcategory-{i}-{j}',
+            image=PLACEHOLDER_IMAGE.format('subcategories'),
+            category=category
+        ) for i, category in enumerate(category_objects)
+            for j in range(subcategories)]
+        self.bulk_create(Subcategory, subcategory_objects,
+                         len(subcategory_objects), batch_size)
+
+        def product_objects():
+            for i in range(products):
+                subcategory = rng.choice(subcategory_objects)
+                yield Product(
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}',
+                    price=Decimal(rng.randint(100, 500_000)).scaleb(-2),
+                    slug=f'{prefix}-product-{i}',
+                    category_id=subcategory.category_id,
+                    subcategory=subcategory,
+                    **{field: PLACEHOLDER_IMAGE.format(
+                        Product._meta.get_field(field).upload_to.rstrip('/'))
+                       for field in IMAGE_FIELDS})
+
+        product_pks = self.bulk_create(Product, product_objects(), products,
+                                       batch_size)
+
+        password_hash = make_password(password)
+        user_pks = self.bulk_create(User, (User(
+            username=f'{prefix}-user-{i}', password=password_hash
+        ) for i in range(users)), users, batch_size)
+
+        def cart_lines():
+            per_user, extra = divmod(cart_rows, len(user_pks) or 1)
+            for index, user_pk in enumerate(user_pks):
+                count = per_user + (index < extra)
+                for product_index in rng.sample(range(len(product_pks)),
+                                                count):
+                    active = rng.random() >= inactive_ratio
+                    yield ShoppingCart(
+                        user_id=user_pk,
+                        product_id=product_pks[product_index],
+                        amount=rng.randint(1, 5) if active else 0,
+                        is_in_shopping_cart=active)
+
+        self.bulk_create(ShoppingCart, cart_lines(), cart_rows, batch_size)
+        bump_version(Category, Subcategory, Product)
+        self.stdout.write(self.style.SUCCESS(
+            f'Категорий: {categories}, подкатегорий: '
+            f'{len(subcategory_objects)}, продуктов: {products}, '
+            f'пользователей: {users}, строк корзины: {cart_rows}, '
+            f'время: {time.perf_counter() - started:.2f} с'))
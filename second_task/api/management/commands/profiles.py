@@ -0,0 +1,70 @@
+import io
+import os
+import pstats
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import ProfileStore
+
+
+def get_function_times(stats):
+    """Возвращает {функция: (вызовов, собственное, суммарное время)}."""
+    return {pstats.func_std_string(func): (calls, tottime, cumtime)
+            for func, (_, calls, tottime, cumtime, _) in
+            stats.stats.items()}
+
+
+class Command(BaseCommand):
+    help = 'Выводит и сравнивает снимки cProfile профилирующего middleware.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', help='Каталог снимков.')
+        parser.add_argument('--limit', type=int, default=20)
+        actions = parser.add_subparsers(dest='action', required=True)
+        actions.add_parser('list', help='Список снимков.')
+        show = actions.add_parser('show', help='Самые дорогие функции.')
+        show.add_argument('name')
+        show.add_argument('--sort', default='cumulative')
+        diff = actions.add_parser(
+            'diff', help='Функции с наибольшим изменением суммарного '
+                         'времени между двумя снимками.')
+        diff.add_argument('before')
+        diff.add_argument('after')
+
+    def load(self, store, name):
+        try:
+            return store.load(name)
+        except OSError:
+            raise CommandError(f'Снимок {name} не найден в {store.path}.')
+
+    def handle(self, *args, store, limit, action, **options):
+        store = ProfileStore(path=store)
+        getattr(self, f'handle_{action}')(store, limit, **options)
+
+    def handle_list(self, store, limit, **options):
+        for name in store.list():
+            size = os.path.getsize(store.get_path(name))
+            self.stdout.write(f'{name}\t{size} байт')
+
+    def handle_show(self, store, limit, name, sort, **options):
+        output = io.StringIO()
+        stats = self.load(store, name)
+        stats.stream = output
+        stats.sort_stats(sort).print_stats(limit)
+        self.stdout.write(output.getvalue())
+
+    def handle_diff(self, store, limit, before, after, **options):
+        before_times = get_function_times(self.load(store, before))
+        after_times = get_function_times(self.load(store, after))
+        empty = (0, 0.0, 0.0)
+        deltas = sorted((
+            (after_times.get(func, empty)[2]
+             - before_times.get(func, empty)[2], func)
+            for func in before_times.keys() | after_times.keys()),
+            key=lambda delta: abs(delta[0]), reverse=True)
+        self.stdout.write(f'{"Δ суммарное, мс":>16}  {"вызовов":>15}  '
+                          f'функция')
+        for delta, func in deltas[:limit]:
+            calls = (f'{before_times.get(func, empty)[0]}→'
+                     f'{after_times.get(func, empty)[0]}')
+            self.stdout.write(f'{delta * 1000:>+16.2f}  {calls:>15}  {func}')
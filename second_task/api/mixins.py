@@ -0,0 +1,223 @@
+import hashlib
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from .constants import NO_FIELDS, UNKNOWN_FIELDS
+from .db_routers import (is_pinned_to_primary, pin_to_primary, replica_reads,
+                         use_primary)
+from .versions import changed_recently, get_versions
+
+RESPONSE_CACHE_KEY = 'catalog-response:{}'
+
+
+class CachedResponseMixin:
+    """
+    Кэширует ответы list и retrieve. Ключ строится из URL с
+    отсортированными параметрами, формата ответа и версий моделей из
+    cache_dependencies, поэтому изменение любой из моделей делает старые
+    записи недостижимыми. Ключ также служит сильным ETag: при совпадении
+    If-None-Match ответ 304 отдается без обращения к базе и кэшу.
+    Версии и ответы хранятся в кэше, общем для всех процессов (проверка
+    api.E001), настройка RESPONSE_CACHE_ENABLED отключает кэширование.
+    В течение REPLICA_LAG_SECONDS после изменения зависимостей ответ
+    для кэша читается из основной базы: отстающая реплика сохранила бы
+    старые данные под новой версией.
+    """
+
+    cache_dependencies = ()
+
+    def get_response_cache_key(self, request):
+        query = sorted(request.query_params.lists())
+        signature = '|'.join((
+            request.build_absolute_uri(request.path),
+            repr(query),
+            request.accepted_media_type,
+            repr(get_versions(*self.cache_dependencies)),
+        ))
+        return hashlib.sha1(signature.encode()).hexdigest()
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        etag = f'"{key}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+        data = cache.get(RESPONSE_CACHE_KEY.format(key))
+        if data is None:
+            reads = (use_primary()
+                     if changed_recently(*self.cache_dependencies)
+                     else nullcontext())
+            with reads:
+                response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(RESPONSE_CACHE_KEY.format(key), data,
+                      settings.CATALOG_CACHE_TIMEOUT)
+        return Response(data, headers={'ETag': etag})
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class ValuesListMixin:
+    """
+    Отдает список через representation_class, который строит JSON из
+    строк values(), а не из объектов через сериализатор. Отключается
+    настройкой FAST_LIST_REPRESENTATION.
+    """
+
+    representation_class = None
+
+    def get_list_response(self, queryset):
+        representation = None
+        if (self.representation_class is not None
+                and settings.FAST_LIST_REPRESENTATION):
+            representation = self.get_representation()
+            queryset = representation.get_values(queryset)
+        page = self.paginate_queryset(queryset)
+        rows = queryset if page is None else page
+        if representation is not None:
+            data = representation.represent(rows)
+        else:
+            data = self.get_serializer(rows, many=True).data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def get_representation(self):
+        return self.representation_class(self.request)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_list_response(
+            self.filter_queryset(self.get_queryset()))
+
+
+class SparseFieldsMixin:
+    """
+    Параметры fields и omit со списком полей через запятую оставляют в
+    ответе чтения только нужные поля representation_class. Колонки
+    остальных полей не выбираются: быстрое представление берет из
+    values() только нужные колонки, для сериализатора queryset
+    ограничивается only(), а сериализатор не строит лишние поля.
+    Колонки ключа keyset-пагинатора выбираются всегда, иначе по
+    странице нельзя построить курсор.
+    """
+
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    def get_sparse_fields(self):
+        """
+        Возвращает кортеж выбранных полей в порядке вывода или None, если
+        нужны все поля.
+        """
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self.parse_sparse_fields()
+        return self._sparse_fields
+
+    def parse_sparse_fields(self):
+        params = self.request.query_params
+        if (self.request.method not in SAFE_METHODS
+                or self.representation_class is None
+                or not {self.fields_query_param,
+                        self.omit_query_param} & params.keys()):
+            return None
+        names = self.representation_class.get_field_names()
+        selected = set(names)
+        for param in (self.fields_query_param, self.omit_query_param):
+            if param not in params:
+                continue
+            requested = self.expand_fields(param, params[param])
+            if param == self.fields_query_param:
+                selected &= requested
+            else:
+                selected -= requested
+        if not selected:
+            raise ValidationError({self.fields_query_param: NO_FIELDS})
+        return tuple(name for name in names if name in selected)
+
+    def expand_fields(self, param, value):
+        """
+        Разбирает список полей, раскрывая группы вроде images в
+        составляющие их поля.
+        """
+        groups = self.representation_class.field_groups
+        available = {*self.representation_class.get_field_names(), *groups}
+        requested = {name.strip() for name in value.split(',')} - {''}
+        unknown = requested - available
+        if unknown:
+            raise ValidationError({param: UNKNOWN_FIELDS.format(
+                ', '.join(sorted(unknown)))})
+        return {field for name in requested
+                for field in groups.get(name, (name,))}
+
+    def get_key_columns(self):
+        """Возвращает колонки, по которым пагинатор строит курсор."""
+        return getattr(self.paginator, 'ordering', ())
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        return self.representation_class.restrict_queryset(
+            queryset, fields, self.get_key_columns())
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(),
+                'fields': self.get_sparse_fields()}
+
+    def get_representation(self):
+        return self.representation_class(
+            self.request, self.get_sparse_fields(), self.get_key_columns())
+
+
+class PrimaryPinMixin:
+    """
+    После успешного пишущего запроса к каталогу закрепляет чтения
+    пользователя за основной базой, чтобы следующие запросы видели его
+    изменения.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (request.method not in SAFE_METHODS
+                and request.user.is_authenticated
+                and status.is_success(response.status_code)):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaReadMixin:
+    """
+    Разрешает читающим запросам брать каталог с реплик, если
+    пользователь не закреплен за основной базой после недавней записи.
+    Решение принимается после аутентификации.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method in SAFE_METHODS
+                and not is_pinned_to_primary(request.user)):
+            self.replica_token = replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, 'replica_token', None)
+        if token is not None:
+            replica_reads.reset(token)
+            self.replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
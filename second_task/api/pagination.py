@@ -1,5 +1,184 @@
-from rest_framework.pagination import LimitOffsetPagination
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (LimitOffsetPagination, BasePagination,
+                                       _positive_int)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .constants import INVALID_COUNT_MODE, INVALID_CURSOR
+from .counts import COUNT_ESTIMATE, COUNT_MODES, COUNT_NONE, get_count
 
 
 class SarafanPageNumberPagination(LimitOffsetPagination):
+    """
+    Пагинация limit/offset с кэшированным числом записей. Параметр count
+    выбирает способ подсчета: exact — точное число, estimate — оценка
+    по статистике СУБД для больших выборок, none — без подсчета, тогда
+    count в ответе null. Число записей кэшируется по условиям выборки до
+    изменения моделей из cache_dependencies представления.
+
+    Оценка может отставать от таблицы, поэтому число записей попадает
+    только в поле count. Наличие следующей страницы во всех режимах
+    определяется лишней строкой, а смещение за оценкой не обрезается.
+    """
+
     max_page_size = 100
+    count_query_param = 'count'
+    default_count_mode = COUNT_ESTIMATE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_mode = self.get_count_mode(request)
+        self.count_dependencies = getattr(view, 'cache_dependencies', ())
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.count = None
+        if self.count_mode != COUNT_NONE:
+            self.count = self.get_count(queryset)
+        self.offset = self.get_offset(request)
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        if self.template is not None and self.count is not None and (
+                self.count > self.limit or self.has_next):
+            self.display_page_controls = True
+        return results[:self.limit]
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(
+            self.count_query_param, self.default_count_mode)
+        if mode not in COUNT_MODES:
+            raise ValidationError({self.count_query_param: INVALID_COUNT_MODE})
+        return mode
+
+    def get_count(self, queryset):
+        return get_count(queryset, self.count_mode, self.count_dependencies)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = replace_query_param(self.request.build_absolute_uri(),
+                                  self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param,
+                                   self.offset + self.limit)
+
+
+class SarafanSearchPagination(SarafanPageNumberPagination):
+    default_limit = 20
+
+
+class SarafanCursorPagination(BasePagination):
+    """
+    Keyset-пагинация по паре (created_at, id). Страница выбирается
+    условием на ключ последней записи предыдущей страницы, поэтому
+    стоимость запроса не зависит от номера страницы и COUNT не нужен.
+    Включается передачей параметра cursor (первая страница: ?cursor=).
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 20
+    max_page_size = 100
+    ordering = ('created_at', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        created_at, pk, self.reverse = self.cursor or (None, None, False)
+
+        if self.reverse:
+            queryset = queryset.order_by(
+                *(f'-{field}' for field in self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if self.cursor is not None:
+            lookup = 'lt' if self.reverse else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'created_at__{lookup}e': created_at}),
+                Q(**{f'created_at__{lookup}': created_at})
+                | Q(**{f'id__{lookup}': pk}))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True, cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            created_at = parse_datetime(position['created_at'])
+            pk = int(position['id'])
+            reverse = bool(position.get('reverse'))
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(INVALID_CURSOR)
+        if created_at is None:
+            raise NotFound(INVALID_CURSOR)
+        return created_at, pk, reverse
+
+    @staticmethod
+    def get_position(item):
+        """Возвращает ключ записи страницы: объекта или строки values()."""
+        if isinstance(item, dict):
+            return item['created_at'], item['id']
+        return item.created_at, item.pk
+
+    def encode_cursor(self, item, reverse):
+        created_at, pk = self.get_position(item)
+        position = {'created_at': created_at.isoformat(), 'id': pk}
+        if reverse:
+            position['reverse'] = True
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(position).encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.page or (not self.reverse and not self.has_more):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if self.cursor is None or not self.page or (
+                self.reverse and not self.has_more):
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True,
+                         'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True,
+                             'format': 'uri'},
+                'results': schema,
+            },
+        }
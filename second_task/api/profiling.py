@@ -0,0 +1,163 @@
+import cProfile
+import os
+import pstats
+import random
+import re
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+PROFILE_SUFFIX = '.prof'
+
+request_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Накопитель длительностей этапов одного запроса в секундах. Вложенные
+    замеры одного этапа не суммируются повторно: учитывается только
+    внешний.
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self._depth = {}
+
+    @contextmanager
+    def measure(self, name):
+        depth = self._depth.get(name, 0)
+        self._depth[name] = depth + 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] = depth
+            if not depth:
+                self.add(name, time.perf_counter() - started)
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        self.queries += 1
+        with self.measure('db'):
+            return execute(sql, params, many, context)
+
+    def get_server_timing(self, total):
+        metrics = [f'db;dur={self.durations.get("db", 0.0) * 1000:.2f};'
+                   f'desc="{self.queries} queries"']
+        metrics += [f'{name};dur={duration * 1000:.2f}'
+                    for name, duration in self.durations.items()
+                    if name != 'db']
+        metrics.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def measure(name):
+    """
+    Замеряет этап текущего запроса. Вне профилируемого запроса ничего
+    не делает.
+    """
+    timings = request_timings.get()
+    if timings is None:
+        yield
+        return
+    with timings.measure(name):
+        yield
+
+
+class ProfileStore:
+    """
+    Каталог с дампами cProfile. Хранит не больше max_files последних
+    снимков, более старые удаляются при сохранении нового.
+    """
+
+    def __init__(self, path=None, max_files=None):
+        self.path = path or settings.PROFILING_STORE_DIR
+        self.max_files = max_files or settings.PROFILING_STORE_MAX_FILES
+
+    def list(self):
+        """Возвращает имена снимков от старых к новым."""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name for name in os.listdir(self.path)
+                      if name.endswith(PROFILE_SUFFIX))
+
+    def get_path(self, name):
+        if not name.endswith(PROFILE_SUFFIX):
+            name += PROFILE_SUFFIX
+        return os.path.join(self.path, os.path.basename(name))
+
+    def save(self, profiler, request, duration):
+        os.makedirs(self.path, exist_ok=True)
+        route = re.sub(r'[^\w-]+', '_', request.path).strip('_')
+        name = (f'{time.time_ns()}-{request.method}-{route or "root"}-'
+                f'{duration * 1000:.0f}ms{PROFILE_SUFFIX}')
+        profiler.dump_stats(os.path.join(self.path, name))
+        for stale in self.list()[:-self.max_files]:
+            try:
+                os.remove(self.get_path(stale))
+            except FileNotFoundError:
+                pass
+        return name
+
+    def load(self, name):
+        return pstats.Stats(self.get_path(name))
+
+
+class ProfilingMiddleware:
+    """
+    Выборочно профилирует запросы. Для доли PROFILING_SAMPLE_RATE
+    запросов считает число и время SQL-запросов, время аутентификации,
+    сериализации и рендеринга и отдает их в заголовке Server-Timing.
+    Доля PROFILING_CPROFILE_RATE запросов дополнительно снимается
+    cProfile и сохраняется в ProfileStore.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.store = ProfileStore()
+
+    def __call__(self, request):
+        if not settings.PROFILING_ENABLED or (
+                random.random() >= settings.PROFILING_SAMPLE_RATE):
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        profiler = None
+        if random.random() < settings.PROFILING_CPROFILE_RATE:
+            profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.execute_wrapper))
+                if profiler is not None:
+                    profiler.enable()
+                    stack.callback(profiler.disable)
+                response = self.get_response(request)
+        finally:
+            request_timings.reset(token)
+        total = time.perf_counter() - started
+        response['Server-Timing'] = timings.get_server_timing(total)
+        if profiler is not None:
+            response['X-Profile'] = self.store.save(profiler, request, total)
+        return response
+
+    def process_template_response(self, request, response):
+        """
+        Замеряет рендеринг ответов DRF: он выполняется после этого хука,
+        но до возврата ответа в __call__.
+        """
+        timings = request_timings.get()
+        if timings is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(lambda response: timings.add(
+                'render', time.perf_counter() - started))
+        return response
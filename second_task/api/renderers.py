@@ -0,0 +1,40 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class SarafanJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер, который при установленном orjson кодирует ответ им.
+    Вывод совпадает с JSONRenderer: даты и прочие типы, которые orjson
+    кодирует по-своему, передаются кодировщику DRF. Без orjson, при
+    запрошенном отступе или несовместимых настройках UNICODE_JSON и
+    COMPACT_JSON работает как JSONRenderer.
+
+    Исключение — числа с плавающей точкой, включая Decimal, которые
+    кодировщик DRF превращает во float: orjson пишет порядок без
+    ведущего нуля (1e-7 вместо 1e-07), а NaN и Infinity кодирует как
+    null, тогда как JSONRenderer при STRICT_JSON отказывается их
+    кодировать. Каталог отдает цены строками (COERCE_DECIMAL_TO_STRING),
+    поэтому его ответы это не затрагивает; формат закреплен тестом.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact or self.get_indent(
+                    accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace(
+            '\u2029'.encode(), b'\\u2029')
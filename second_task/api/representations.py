@@ -0,0 +1,181 @@
+from functools import partial
+
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework import serializers
+
+from category.models import Category, Subcategory
+from product.models import Product
+from product.renditions import IMAGE_FIELDS
+from .profiling import measure
+
+datetime_field = serializers.DateTimeField()
+
+
+class ValuesRepresentation:
+    """
+    Представление списка, которое строится прямо из строк values() в
+    той же форме JSON, что и сериализатор, без машинерии полей
+    ModelSerializer. Совпадение вывода проверяется контрактным тестом.
+    Если передан fields, в представление попадают только эти поля, а
+    колонки остальных не выбираются из базы. Колонки key_columns нужны
+    пагинатору для ключа страницы: они выбираются всегда, но в вывод
+    попадают, только если запрошены.
+    """
+
+    model = None
+    columns = {}
+    file_fields = ()
+    extra_fields = ()
+    field_groups = {}
+
+    def __init__(self, request, fields=None, key_columns=()):
+        self.request = request
+        self.fields = self.get_field_names() if fields is None else fields
+        self.key_columns = key_columns
+        self.converters = [
+            (field, self.columns[field], self.get_converter(field))
+            for field in self.fields if field in self.columns]
+
+    @classmethod
+    def get_field_names(cls):
+        """Возвращает имена всех полей представления в порядке вывода."""
+        return (*cls.columns, *cls.extra_fields)
+
+    @classmethod
+    def get_columns(cls, fields):
+        return list(dict.fromkeys(
+            cls.columns[field] for field in fields if field in cls.columns))
+
+    @classmethod
+    def restrict_queryset(cls, queryset, fields, key_columns=()):
+        """
+        Ограничивает queryset модели колонками полей fields и key_columns
+        для вывода сериализатором: остальные колонки откладываются через
+        only(), лишние select_related снимаются.
+        """
+        columns = cls.get_columns(fields)
+        relations = {column.split(LOOKUP_SEP)[0] for column in columns
+                     if LOOKUP_SEP in column}
+        queryset = queryset.select_related(None).only(*columns, *key_columns)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset
+
+    def get_converter(self, field):
+        if field in self.file_fields:
+            return partial(self.get_file_url, self.columns[field])
+        return getattr(self, f'represent_{field}', None)
+
+    def get_values(self, queryset):
+        return queryset.prefetch_related(None).values(*dict.fromkeys(
+            (*self.get_columns(self.fields), *self.key_columns)))
+
+    def get_file_url(self, field, name):
+        if not name:
+            return None
+        url = self.model._meta.get_field(field).storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    @staticmethod
+    def represent_created_at(value):
+        return datetime_field.to_representation(value)
+
+    def to_representation(self, row):
+        return {field: row[column] if convert is None else convert(row[column])
+                for field, column, convert in self.converters}
+
+    def represent(self, rows):
+        with measure('serialize'):
+            return [self.to_representation(row) for row in rows]
+
+
+class ProductRepresentation(ValuesRepresentation):
+    model = Product
+    columns = {
+        'id': 'id',
+        'category': 'category__title',
+        'subcategory': 'subcategory__title',
+        'slug': 'slug',
+        'created_at': 'created_at',
+        'name': 'name',
+        'price': 'price',
+        **{field: field for field in IMAGE_FIELDS},
+    }
+    file_fields = IMAGE_FIELDS
+    field_groups = {'images': IMAGE_FIELDS}
+    price_field = serializers.DecimalField(
+        max_digits=Product._meta.get_field('price').max_digits,
+        decimal_places=Product._meta.get_field('price').decimal_places)
+
+    def represent_price(self, value):
+        return self.price_field.to_representation(value)
+
+    def to_representation(self, row):
+        """Собирает размеры изображений в список images, как сериализатор."""
+        data = super().to_representation(row)
+        images = {field: data.pop(field) for field in IMAGE_FIELDS
+                  if field in data}
+        if images:
+            data['images'] = [images]
+        return data
+
+
+class CategoryRepresentation(ValuesRepresentation):
+    model = Category
+    columns = {
+        'id': 'id',
+        'image': 'image',
+        'slug': 'slug',
+        'created_at': 'created_at',
+        'title': 'title',
+    }
+    file_fields = ('image',)
+    extra_fields = ('subcategories',)
+
+    @classmethod
+    def get_columns(cls, fields):
+        columns = super().get_columns(fields)
+        if 'subcategories' in fields and 'id' not in columns:
+            columns.append('id')
+        return columns
+
+    @classmethod
+    def restrict_queryset(cls, queryset, fields, key_columns=()):
+        queryset = super().restrict_queryset(queryset, fields, key_columns)
+        if 'subcategories' not in fields:
+            queryset = queryset.prefetch_related(None)
+        return queryset
+
+    def represent(self, rows):
+        """
+        Добавляет названия подкатегорий одним запросом на страницу, как
+        prefetch_related('subcategory') у сериализатора.
+        """
+        if 'subcategories' not in self.fields:
+            return super().represent(rows)
+        rows = list(rows)
+        subcategories = {row['id']: [] for row in rows}
+        if subcategories:
+            for category_id, title in Subcategory.objects.filter(
+                    category__in=list(subcategories)
+            ).values_list('category_id', 'title'):
+                subcategories[category_id].append(title)
+        data = super().represent(rows)
+        for row, item in zip(rows, data):
+            item['subcategories'] = subcategories[row['id']]
+        return data
+
+
+class SubcategoryRepresentation(ValuesRepresentation):
+    model = Subcategory
+    columns = {
+        'id': 'id',
+        'image': 'image',
+        'category': 'category__title',
+        'slug': 'slug',
+        'created_at': 'created_at',
+        'title': 'title',
+    }
+    file_fields = ('image',)
@@ -1,35 +1,81 @@
-import base64
+import binascii
+from http import HTTPStatus
 
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import serializers
-from django.core.files.base import ContentFile
-from django.core.exceptions import ValidationError
 
+from product.export import FORMATS as EXPORT_FORMATS
 from product.models import Product, ShoppingCart
+from product.renditions import IMAGE_FIELDS, schedule_product_images
 from category.models import Category, Subcategory
 from rest_framework.validators import UniqueTogetherValidator
 
-from .constants import ALREADY_IN_SHOPPING_CART, NOT_IN_SHOPPING_CART
+from . import cart_summary
+from .conflicts import CartVersionConflict, VersionConflict, retry_on_conflict
+from .profiling import measure
+from .uploads import decode_base64_to_file
+from .constants import (ALREADY_IN_SHOPPING_CART, NOT_IN_SHOPPING_CART,
+                        PRODUCT_NOT_FOUND, AMOUNT_REQUIRED,
+                        PRODUCT_IMAGES_REQUIRED, CART_OPERATIONS,
+                        CART_OPERATION_ADD, CART_OPERATION_SET,
+                        CART_OPERATION_STATUSES, CART_BATCH_MAX_SIZE)
 
 
 class Base64ImageField(serializers.ImageField):
     """
-    Кастомное поле для обработки изображений, закодированных в формате
-    Base64. Преобразует строку Base64 в объект ContentFile, который
-    можно сохранить как изображение.
+    Кастомное поле для обработки изображений. Принимает файл из
+    multipart-запроса или, для совместимости, строку Base64, которая
+    по частям декодируется во временный файл на диске.
     """
 
     def to_internal_value(self, image_data):
         if isinstance(image_data, str) and image_data.startswith('data:image'):
             format, imgstr = image_data.split(';base64,')
             ext = format.split('/')[-1]
-            image_data = ContentFile(base64.b64decode(imgstr),
-                                     name=f'temp.{ext}')
+            try:
+                image_data = decode_base64_to_file(
+                    imgstr, name=f'temp.{ext}',
+                    content_type=format.split(':')[-1])
+            except (ValueError, binascii.Error) as error:
+                raise serializers.ValidationError(str(error))
 
         return super().to_internal_value(image_data)
 
 
-class SarafanBaseSerializer(serializers.ModelSerializer):
+class ProfiledSerializerMixin:
+    """
+    Учитывает время to_representation в профиле запроса как этап
+    serialize.
+    """
+
+    def to_representation(self, instance):
+        with measure('serialize'):
+            return super().to_representation(instance)
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Оставляет только поля из context['fields'], если он задан: остальные
+    поля не строятся и не сериализуются.
+    """
+
+    def get_selected_fields(self):
+        return self.context.get('fields')
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.get_selected_fields()
+        if selected is None:
+            return fields
+        return {name: field for name, field in fields.items()
+                if name in selected}
+
+
+class SarafanBaseSerializer(SparseFieldsSerializerMixin,
+                            ProfiledSerializerMixin,
+                            serializers.ModelSerializer):
     """
     Базовый сериализатор для моделей с поддержкой Base64 изображений.
     """
@@ -40,21 +86,51 @@ class SarafanBaseSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsSerializerMixin,
+                        ProfiledSerializerMixin,
+                        serializers.ModelSerializer):
     """
     Сериализатор для модели Product, который обрабатывает изображения
-    (thumbnail, medium, large) в формате Base64 и выводит категории и
-    подкатегории как строки.
+    (thumbnail, medium, large) в формате Base64 или multipart и выводит
+    категории и подкатегории как строки. Вместо трех изображений можно
+    передать одно исходное image: размеры будут построены в фоне.
     """
 
-    thumbnail = Base64ImageField(required=True, allow_null=False)
-    large = Base64ImageField(required=True, allow_null=False)
-    medium = Base64ImageField(required=True, allow_null=False)
+    thumbnail = Base64ImageField(required=False, allow_null=False)
+    large = Base64ImageField(required=False, allow_null=False)
+    medium = Base64ImageField(required=False, allow_null=False)
+    image = Base64ImageField(required=False, allow_null=False,
+                             write_only=True)
     category = serializers.StringRelatedField(read_only=True)
     subcategory = serializers.StringRelatedField(read_only=True)
 
-    class Meta(SarafanBaseSerializer.Meta):
+    class Meta:
         model = Product
+        exclude = ('updated_at',)
+
+    def validate(self, product_data):
+        """
+        Проверяет, что передано исходное изображение или все три размера.
+        Исходное изображение сохраняется в large до построения размеров,
+        размеры, переданные вместе с ним, из него не строятся.
+        """
+        source = product_data.pop('image', None)
+        self.has_source_image = source is not None
+        if self.has_source_image:
+            self.derived_fields = tuple(
+                field for field in IMAGE_FIELDS
+                if field == 'large' or field not in product_data)
+            product_data['large'] = source
+        elif not self.partial and not all(
+                product_data.get(field) for field in IMAGE_FIELDS):
+            raise serializers.ValidationError(PRODUCT_IMAGES_REQUIRED)
+        return product_data
+
+    def save(self, **kwargs):
+        product = super().save(**kwargs)
+        if self.has_source_image:
+            schedule_product_images(product.pk, self.derived_fields)
+        return product
 
     def to_representation(self, instance):
         """
@@ -62,12 +138,10 @@ class ProductSerializer(serializers.ModelSerializer):
         сгруппированными в список.
         """
         data = super().to_representation(instance)
-        thumbnail, medium, large = (data.pop('thumbnail'), data.pop('medium'),
-                                    data.pop('large'))
-        list_images = [
-            {'thumbnail': thumbnail, 'medium': medium, 'large': large}
-        ]
-        data['images'] = list_images
+        images = {field: data.pop(field) for field in IMAGE_FIELDS
+                  if field in data}
+        if images:
+            data['images'] = [images]
         return data
 
 
@@ -82,8 +156,10 @@ class CategorySerializer(SarafanBaseSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data['subcategories'] = [obj.title for obj in
-                                 instance.subcategory.all()]
+        selected = self.get_selected_fields()
+        if selected is None or 'subcategories' in selected:
+            data['subcategories'] = [obj.title for obj in
+                                     instance.subcategory.all()]
         return data
 
 
@@ -98,7 +174,8 @@ class SubcategorySerializer(SarafanBaseSerializer):
         model = Subcategory
 
 
-class BaseShoppingCartSerializer(serializers.ModelSerializer):
+class BaseShoppingCartSerializer(ProfiledSerializerMixin,
+                                 serializers.ModelSerializer):
     """
     Базовый сериализатор для объектов ShoppingCart.
     """
@@ -117,63 +194,81 @@ class BaseShoppingCartSerializer(serializers.ModelSerializer):
 class ShoppingCartPostPutDeleteSerializer(BaseShoppingCartSerializer):
     """
     Сериализатор для создания, обновления и удаления объектов
-    ShoppingCart.
+    ShoppingCart. Версия строки возвращается в ответе; переданная в
+    PUT-запросе версия защищает от перезаписи чужого изменения.
     """
 
     user = serializers.PrimaryKeyRelatedField(
         read_only=True, default=serializers.CurrentUserDefault())
+    version = serializers.IntegerField(min_value=1, required=False)
 
     class Meta(BaseShoppingCartSerializer.Meta):
-        fields = ('amount', 'user')
+        fields = ('amount', 'user', 'version')
         read_only_fields = ('is_in_shopping_cart', 'product')
 
     def get_product(self):
-        product = self.get_request().parser_context.get(
-            'kwargs').get('product_pk')
-        return get_object_or_404(Product, pk=product)
+        """
+        Возвращает продукт из URL. Продукт запрашивается один раз за
+        время жизни сериализатора.
+        """
+        if not hasattr(self, '_product'):
+            product = self.get_request().parser_context.get(
+                'kwargs').get('product_pk')
+            self._product = get_object_or_404(
+                Product.objects.only('id', 'name', 'price'), pk=product)
+        return self._product
 
     def validate(self, shopping_cart_data):
         """
-        Проверяет наличие продукта в корзине. Если продукт уже в
-        корзине при POST-запросе, возвращает ошибку. Если продукта
-        нет в корзине при PUT-запросе, также возвращает ошибку.
+        Проверяет существование продукта. Наличие продукта в корзине
+        проверяется при записи, атомарно вместе с ней.
         """
-        request = self.get_request()
-        product = self.get_product()
-        shopping_cart_data['product'] = product
-        user = self.get_user()
-        query = ShoppingCart.objects.filter(
-            product=product, user=user,
-            is_in_shopping_cart=True).exists()
-        if request.method in 'POST':
-            if query:
-                raise ValidationError(ALREADY_IN_SHOPPING_CART)
-
-        elif request.method == 'PUT':
-            if not query:
-                raise ValidationError(NOT_IN_SHOPPING_CART)
+        shopping_cart_data['product'] = self.get_product()
         return shopping_cart_data
 
-    def update_or_create_shopping_cart(self, user, product, amount):
+    @staticmethod
+    def raise_error(error):
+        raise serializers.ValidationError(
+            {field: [message] for field, message in error.items()})
+
+    def update_or_create_shopping_cart(self, user, product, amount,
+                                       version=None):
         """
-        Обновляет или создает объект корзины покупок для текущего
-        пользователя и продукта.
+        Добавляет продукт в корзину при POST-запросе и меняет его кол-во
+        при PUT-запросе одним SQL-запросом, повторяя его при конфликте с
+        параллельной записью. Если продукт уже в корзине при POST-запросе
+        или его нет в корзине при PUT-запросе, возвращает ошибку, а если
+        версия строки устарела — конфликт.
         """
-        cart, _ = ShoppingCart.objects.update_or_create(
-            product=product, user=user,
-            defaults={'is_in_shopping_cart': True, 'amount': amount})
+        if self.get_request().method == 'PUT':
+            cart = retry_on_conflict(ShoppingCart.objects.set_amount, user,
+                                     product, amount, version)
+            if cart is None:
+                if version is not None and ShoppingCart.objects.filter(
+                        user=user, product=product,
+                        is_in_shopping_cart=True).exists():
+                    raise CartVersionConflict
+                self.raise_error(NOT_IN_SHOPPING_CART)
+        else:
+            cart = retry_on_conflict(ShoppingCart.objects.add_product, user,
+                                     product, amount)
+            if cart is None:
+                self.raise_error(ALREADY_IN_SHOPPING_CART)
+        cart_summary.invalidate_on_commit([user.pk])
         return cart
 
     def create(self, validated_data):
         cart = self.update_or_create_shopping_cart(
-            product=self.get_product(), user=self.get_user(),
-            amount=validated_data.get('amount'))
+            product=validated_data.get('product'), user=self.get_user(),
+            amount=validated_data.get('amount'),
+            version=validated_data.get('version'))
         return cart
 
     def update(self, instance, validated_data):
         cart = self.update_or_create_shopping_cart(
-            product=self.get_product(), user=self.get_user(),
-            amount=validated_data.get('amount'))
+            product=validated_data.get('product'), user=self.get_user(),
+            amount=validated_data.get('amount'),
+            version=validated_data.get('version'))
         return cart
 
     def to_representation(self, instance):
@@ -186,3 +281,140 @@ class ShoppingCartPostPutDeleteSerializer(BaseShoppingCartSerializer):
         data['user'] = instance.user.username
         data['product'] = instance.product.name
         return data
+
+
+class ShoppingCartBatchSerializer(serializers.ListSerializer):
+    """
+    Сериализатор пакета операций с корзиной. Проверяет все продукты
+    одним запросом и применяет операции к прочитанным строкам. Запись
+    идет в короткой транзакции массовыми вставкой и обновлением, которое
+    проверяет, что строки остались в корзине или вне ее, как при
+    чтении; иначе пакет применяется заново к перечитанной корзине.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', CART_BATCH_MAX_SIZE)
+        super().__init__(*args, **kwargs)
+
+    def get_user(self):
+        return self.context.get('request').user
+
+    @staticmethod
+    def get_error(item, error, status):
+        return {
+            'product': item['product'],
+            'operation': item['operation'],
+            'status': status,
+            'errors': list(error.values()),
+        }
+
+    def apply_operation(self, item, line):
+        """
+        Применяет операцию к строке корзины по тем же правилам, что и
+        ShoppingCartPostPutDeleteSerializer. Возвращает ошибку или None.
+        """
+        operation = item['operation']
+        if operation == CART_OPERATION_ADD:
+            if line.is_in_shopping_cart:
+                return self.get_error(item, ALREADY_IN_SHOPPING_CART,
+                                      HTTPStatus.BAD_REQUEST)
+            line.amount = item['amount']
+            line.is_in_shopping_cart = True
+        elif not line.is_in_shopping_cart:
+            return self.get_error(item, NOT_IN_SHOPPING_CART,
+                                  HTTPStatus.BAD_REQUEST)
+        elif operation == CART_OPERATION_SET:
+            line.amount = item['amount']
+        else:
+            line.is_in_shopping_cart = False
+        return None
+
+    def apply_batch(self, user, validated_data, products):
+        """
+        Читает строки корзины вне транзакции, применяет к ним операции и
+        записывает изменения. Возвращает результаты операций и
+        измененные строки.
+        """
+        lines = {line.product_id: line for line in
+                 ShoppingCart.objects.filter(user=user,
+                                             product__in=products)}
+        expected = {line.pk: {'is_in_shopping_cart': line.is_in_shopping_cart}
+                    for line in lines.values()}
+        results, changed = [], {}
+        for item in validated_data:
+            product = products.get(item['product'])
+            if product is None:
+                results.append(self.get_error(
+                    item, PRODUCT_NOT_FOUND, HTTPStatus.NOT_FOUND))
+                continue
+            line = changed.get(product.pk) or lines.get(product.pk)
+            if line is None:
+                line = ShoppingCart(user=user, product=product,
+                                    is_in_shopping_cart=False)
+            error = self.apply_operation(item, line)
+            if error is not None:
+                results.append(error)
+                continue
+            changed[product.pk] = line
+            results.append({
+                'product': product.pk,
+                'operation': item['operation'],
+                'status': CART_OPERATION_STATUSES[item['operation']],
+                'name': product.name,
+                'amount': line.amount,
+                'is_in_shopping_cart': line.is_in_shopping_cart,
+            })
+        new_lines = [line for line in changed.values() if line.pk is None]
+        updated_lines = [line for line in changed.values()
+                         if line.pk is not None]
+        now = timezone.now()
+        for line in updated_lines:
+            line.updated_at = now
+        with transaction.atomic():
+            if ShoppingCart.objects.update_if_unchanged(
+                    updated_lines, ('amount', 'is_in_shopping_cart',
+                                    'updated_at'),
+                    expected) != len(updated_lines):
+                raise VersionConflict
+            ShoppingCart.objects.bulk_create(new_lines)
+        return results, changed
+
+    def create(self, validated_data):
+        user = self.get_user()
+        products = Product.objects.only('id', 'name', 'price').in_bulk(
+            {item['product'] for item in validated_data})
+        results, changed = retry_on_conflict(
+            self.apply_batch, user, validated_data, products)
+        if changed:
+            cart_summary.invalidate_on_commit([user.pk])
+        return results
+
+
+class ShoppingCartBatchItemSerializer(serializers.Serializer):
+    """
+    Сериализатор одной операции пакетного изменения корзины.
+    """
+
+    product = serializers.IntegerField(min_value=1)
+    operation = serializers.ChoiceField(choices=CART_OPERATIONS,
+                                        default=CART_OPERATION_ADD)
+    amount = serializers.IntegerField(min_value=1, required=False)
+
+    class Meta:
+        list_serializer_class = ShoppingCartBatchSerializer
+
+    def validate(self, item):
+        if (item['operation'] in (CART_OPERATION_ADD, CART_OPERATION_SET)
+                and item.get('amount') is None):
+            raise serializers.ValidationError(AMOUNT_REQUIRED)
+        return item
+
+
+class ProductExportSerializer(serializers.Serializer):
+    """
+    Сериализатор параметров выгрузки каталога.
+    """
+
+    file_format = serializers.ChoiceField(choices=EXPORT_FORMATS,
+                                          default=EXPORT_FORMATS[0])
+    updated_since = serializers.DateTimeField(required=False)
@@ -0,0 +1,50 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from category.models import Category, Subcategory
+from product.models import Product, ShoppingCart
+from . import cart_summary
+from .authentication import invalidate_user
+from .category_tree import category_tree
+from .versions import bump_version_on_commit
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Category)
+@receiver((post_save, post_delete), sender=Subcategory)
+def rebuild_category_tree(sender, **kwargs):
+    bump_version_on_commit(sender)
+    transaction.on_commit(category_tree.rebuild)
+
+
+@receiver((post_save, post_delete), sender=Product)
+def bump_product_version(sender, **kwargs):
+    bump_version_on_commit(sender)
+
+
+@receiver(post_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def invalidate_cart_summaries(sender, instance, **kwargs):
+    """
+    Сбрасывает итоги корзин, в которых лежит измененный продукт, сразу
+    и после фиксации транзакции.
+    """
+    cart_summary.invalidate_on_commit(ShoppingCart.objects.filter(
+        product=instance, is_in_shopping_cart=True
+    ).order_by().values_list('user_id', flat=True))
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Сбрасывает пользователя в кэше аутентификации сразу и еще раз после
+    фиксации транзакции, чтобы параллельный запрос не закэшировал
+    прочитанную до фиксации копию.
+    """
+    invalidate_user(instance.pk)
+    transaction.on_commit(partial(invalidate_user, instance.pk))
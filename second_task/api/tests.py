@@ -1,19 +1,95 @@
+import base64
+import io
 import json
+import os
+import sys
+import tempfile
+import threading
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
 from http import HTTPStatus
+from unittest import skipIf
 
-from django.test import TestCase, Client
+from PIL import Image
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model, get_user
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
 from product.models import ShoppingCart, Product
+from product.management.commands import import_catalog
+from product.renditions import IMAGE_FIELDS, derive_renditions
+from product.search import search_products
 from category.models import Subcategory, Category
 from .constants import (CATEGORY_TESTS, SUBCATEGORY_TESTS, POST_SHOPPING_CART,
                         START_TEST_SUBCATEGORY, END_TEST_SUBCATEGORY,
-                        PUT_SHOPPING_CART, USER_CREDS)
+                        PUT_SHOPPING_CART, USER_CREDS, QUERY_BUDGETS,
+                        COUNT_QUERY, QUERY_BUDGET_PRODUCTS,
+                        QUERY_BUDGET_PAGE_LIMIT, CURSOR_PAGE_SIZE,
+                        CART_WRITE_QUERIES, ALREADY_IN_SHOPPING_CART,
+                        NOT_IN_SHOPPING_CART, CART_BATCH_QUERIES,
+                        BENCHMARK_PRODUCTS, BENCHMARK_USERS,
+                        BENCHMARK_CART_ROWS, PROFILING_STORE_MAX_FILES,
+                        AUTH_QUERY, IMPORT_BATCH_SIZE, TOKEN_REVOKED,
+                        THROTTLE_RATES, THROTTLE_BURSTS,
+                        CART_VERSION_CONFLICT, ADMIN_CHANGELIST_QUERIES,
+                        REVOCATION_STORE_UNAVAILABLE, STALE_ESTIMATE_EXTRA,
+                        SHARED_CACHE_REQUIRED, ESTIMATE_QUERY,
+                        IMAGE_TOO_LARGE, BASE64_UPLOAD_CHUNKS)
+from .db_routers import (ReadReplicaRouter, is_pinned_to_primary,
+                         replica_reads, use_replicas)
+from .profiling import ProfileStore
+from .admission import AdmissionControlMiddleware
+from . import cart_summary
+from .authentication import REVOKED_TOKEN_KEY, is_token_revoked, revoke_token
+from .caches import check_shared_cache
+from .uploads import BASE64_CHUNK_SIZE, decode_base64_to_file
+from .versions import bump_version, get_version_key, get_versions
+from .throttling import get_bucket_store
+from .renderers import SarafanJSONRenderer, orjson
+from .benchmarks import (EXCLUDED_ROUTES, build_scenarios,
+                         compare_to_baseline, get_route_names)
+from .urls import router
+from .views import SarafanViewSet, ProductViewSet
 
 User = get_user_model()
 
+# Кэши тестов хранятся в отдельном каталоге на каждый запуск: очистка
+# кэша в setUp не должна задевать кэш процессов проекта на этом хосте.
+TEST_CACHE_DIR = tempfile.mkdtemp()
+TEST_CACHES = {
+    DEFAULT_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(TEST_CACHE_DIR, DEFAULT_CACHE_ALIAS),
+        'OPTIONS': settings.CACHE_OPTIONS,
+    },
+    settings.REVOCATION_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(TEST_CACHE_DIR,
+                                 settings.REVOCATION_CACHE_ALIAS),
+        'OPTIONS': {'MAX_ENTRIES': sys.maxsize},
+    },
+}
+
 
+@override_settings(CACHES=TEST_CACHES)
 class TestSarafanBaseCase(TestCase):
     """
     Базовый класс для тестов, содержит общие данные для
@@ -34,6 +110,24 @@ class TestSarafanBaseCase(TestCase):
             category=cls.category
         ) for i in range(START_TEST_SUBCATEGORY, END_TEST_SUBCATEGORY)]
 
+    def setUp(self):
+        cache.clear()
+        get_bucket_store().clear()
+
+    def assertQueryBudget(self, url, budget, **kwargs):
+        """
+        Проверяет, что GET-запрос к url выполняет не больше budget
+        SQL-запросов и возвращает 200.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **kwargs)
+        self.assertEqual(response.status_code, HTTPStatus.OK, 'Не 200 статус')
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{url}: {len(queries)} запросов при бюджете {budget}\n'
+            + '\n'.join(query['sql'] for query in queries))
+        return response
+
 
 class TestCategory(TestSarafanBaseCase):
 
@@ -51,6 +145,49 @@ class TestCategory(TestSarafanBaseCase):
         created_subcategories = [name.title for name in self.subcategories]
         self.assertListEqual(list1=created_subcategories, list2=subcategories)
 
+    def test_category_tree_snapshot(self):
+        """
+        Тест дерева категорий. Повторный запрос обслуживается из снимка
+        без обращений к базе, а изменение подкатегории меняет версию.
+        """
+        url = reverse('api:categories-tree')
+        tree = self.client.get(url).json()
+        subcategories = tree['categories'][0]['subcategories']
+        self.assertListEqual(
+            [subcategory.title for subcategory in self.subcategories],
+            [subcategory['title'] for subcategory in subcategories])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json(), tree)
+
+        Subcategory.objects.create(
+            title='new-subcategory', slug='new-subcategory',
+            category=self.category)
+        new_tree = self.client.get(url).json()
+        self.assertNotEqual(tree['version'], new_tree['version'])
+        self.assertEqual(
+            new_tree['categories'][0]['subcategories'][-1]['title'],
+            'new-subcategory')
+
+    def test_category_tree_invalidated_across_processes(self):
+        """
+        Тест снимка дерева: версия, измененная другим процессом, и
+        истечение CATEGORY_TREE_MAX_AGE перестраивают снимок.
+        """
+        url = reverse('api:categories-tree')
+        with override_settings(CATEGORY_TREE_MAX_AGE=0):
+            self.client.get(url)
+            Category.objects.filter(pk=self.category.pk).update(
+                title='expired')
+            tree = self.client.get(url).json()
+        self.assertEqual(tree['categories'][0]['title'], 'expired')
+
+        self.client.get(url)
+        Category.objects.filter(pk=self.category.pk).update(title='renamed')
+        caches.create_connection(DEFAULT_CACHE_ALIAS).incr(
+            get_version_key(Category))
+        tree = self.client.get(url).json()
+        self.assertEqual(tree['categories'][0]['title'], 'renamed')
+
 
 class TestShoppingCart(TestSarafanBaseCase):
     """
@@ -127,3 +264,1503 @@ class TestShoppingCart(TestSarafanBaseCase):
         amount_after = response.json().get('amount', None)
         self.assertIsNotNone(amount_after, 'Кол-во отсутствует')
         self.assertNotEqual(amount_before, amount_after)
+
+    def test_cart_write_query_count(self):
+        """
+        Тест числа запросов при записи в корзину: проверка продукта и
+        одна атомарная вставка/обновление, с сохранением семантики
+        POST и PUT.
+        """
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertNumQueries(CART_WRITE_QUERIES):
+            response = client.put(self.product_url, PUT_SHOPPING_CART,
+                                  format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['product'], self.product.name)
+
+        with self.assertNumQueries(CART_WRITE_QUERIES):
+            response = client.post(self.product_url, POST_SHOPPING_CART,
+                                   format='json')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(response.json()['errors'],
+                         list(ALREADY_IN_SHOPPING_CART.values()))
+
+        client.delete(self.product_url)
+        with self.assertNumQueries(CART_WRITE_QUERIES):
+            response = client.post(self.product_url, POST_SHOPPING_CART,
+                                   format='json')
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(ShoppingCart.objects.get().amount,
+                         POST_SHOPPING_CART['amount'])
+
+    def test_cart_line_version(self):
+        """
+        Тест версии строки корзины: каждая запись увеличивает ее, а PUT с
+        устаревшей версией возвращает конфликт и ничего не меняет.
+        """
+        client = APIClient()
+        client.force_authenticate(self.user)
+        version = client.put(self.product_url, PUT_SHOPPING_CART,
+                             format='json').json()['version']
+        response = client.put(self.product_url,
+                              {**POST_SHOPPING_CART, 'version': version},
+                              format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['version'], version + 1)
+
+        response = client.put(self.product_url,
+                              {**PUT_SHOPPING_CART, 'version': version},
+                              format='json')
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+        self.assertEqual(response.json()['detail'], CART_VERSION_CONFLICT)
+        line = ShoppingCart.objects.get(user=self.user, product=self.product)
+        self.assertEqual(line.amount, POST_SHOPPING_CART['amount'])
+
+        client.delete(self.product_url)
+        line.refresh_from_db()
+        self.assertFalse(line.is_in_shopping_cart)
+        self.assertEqual(line.version, version + 2)
+
+    def test_batch_operations(self):
+        """
+        Тест пакетного изменения корзины: все продукты проверяются одним
+        запросом, результат возвращается по каждой операции.
+        """
+        other = Product.objects.create(
+            name='iPhone 14', price=899.99, category=self.category,
+            subcategory=self.subcategory, slug='iphone-14')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        operations = [
+            {'product': other.pk, 'amount': 1},
+            {'product': other.pk, 'operation': 'set', 'amount': 3},
+            {'product': self.product.pk, 'operation': 'add', 'amount': 2},
+            {'product': self.product.pk, 'operation': 'remove'},
+            {'product': self.product.pk, 'operation': 'set', 'amount': 2},
+            {'product': other.pk + 100, 'amount': 1},
+        ]
+        with self.assertNumQueries(CART_BATCH_QUERIES):
+            response = client.post(reverse('api:shopping-cart-batch'),
+                                   operations, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        results = response.json()
+        self.assertListEqual(
+            [result['status'] for result in results],
+            [HTTPStatus.CREATED, HTTPStatus.OK, HTTPStatus.BAD_REQUEST,
+             HTTPStatus.NO_CONTENT, HTTPStatus.BAD_REQUEST,
+             HTTPStatus.NOT_FOUND])
+        self.assertEqual(results[2]['errors'],
+                         list(ALREADY_IN_SHOPPING_CART.values()))
+        self.assertEqual(results[4]['errors'],
+                         list(NOT_IN_SHOPPING_CART.values()))
+        self.assertDictEqual(
+            dict(ShoppingCart.objects.filter(
+                user=self.user, is_in_shopping_cart=True
+            ).values_list('product', 'amount')),
+            {other.pk: 3})
+
+    def test_cart_summary(self):
+        """
+        Тест сводки корзины: после первого чтения бейдж обслуживается без
+        запросов к базе, записи и смена цены продукта сбрасывают сводку,
+        и следующее чтение собирает ее одним запросом.
+        """
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('api:shopping-cart-info-get-summary')
+        amount = POST_SHOPPING_CART['amount']
+        self.assertEqual(client.get(url).json(), {
+            'total_items': amount,
+            'total_price': float(self.product.price * amount),
+            'lines': 1})
+
+        client.put(self.product_url, PUT_SHOPPING_CART, format='json')
+        with self.assertNumQueries(1):
+            summary = client.get(url).json()
+        self.assertEqual(summary['total_items'], PUT_SHOPPING_CART['amount'])
+        with self.assertNumQueries(0):
+            client.get(url)
+
+        self.product.price = 1
+        self.product.save()
+        summary = client.get(url).json()
+        self.assertEqual(summary['total_price'],
+                         PUT_SHOPPING_CART['amount'])
+
+        client.delete(reverse('api:clear-shopping-cart'))
+        with self.assertNumQueries(1):
+            summary = client.get(url).json()
+        self.assertEqual(summary['lines'], 0)
+
+    def test_cart_summary_after_commit(self):
+        """
+        Тест сброса сводки после фиксации транзакции: итоги, собранные
+        параллельным чтением до фиксации изменения продукта, недостижимы.
+        """
+        cart_summary.build_lines(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.price = 1
+            self.product.save()
+        stale = cart_summary.build_lines(self.user.pk)
+        self.assertEqual(cache.get(cart_summary.get_key(self.user.pk)),
+                         stale)
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(cart_summary.get_key(self.user.pk)))
+
+    def test_batch_requires_amount(self):
+        """
+        Тест проверки пакета: операции add и set требуют кол-во.
+        """
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(reverse('api:shopping-cart-batch'),
+                               [{'product': self.product.pk}], format='json')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_compact_inactive_lines(self):
+        """
+        Тест компактизации корзины: удаляются только неактивные строки
+        старше заданного возраста, удаленные строки пишутся в архив.
+        """
+        other = Product.objects.create(
+            name='iPhone 14', price=899.99, category=self.category,
+            subcategory=self.subcategory, slug='iphone-14')
+        ShoppingCart.objects.create(user=self.user, product=other, amount=1,
+                                    is_in_shopping_cart=False)
+        ShoppingCart.objects.filter(product=other).update(
+            updated_at=timezone.now() - timedelta(days=31))
+        stale = ShoppingCart.objects.get(product=other)
+        with tempfile.NamedTemporaryFile('r') as archive:
+            call_command('compact_shopping_cart', older_than_days=30,
+                         batch_size=1, sleep=0, archive=archive.name,
+                         stdout=io.StringIO())
+            rows = [json.loads(line) for line in archive]
+        self.assertEqual([row['id'] for row in rows], [stale.pk])
+        self.assertQuerySetEqual(
+            ShoppingCart.objects.values_list('product', flat=True),
+            [self.product.pk])
+
+
+class TestQueryBudget(TestSarafanBaseCase):
+    """
+    Класс проверки бюджета SQL-запросов для всех наследников
+    SarafanViewSet. Число запросов не должно зависеть от размера страницы.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Product.objects.bulk_create(Product(
+            name=f'product{i}',
+            price=i + 1,
+            category=cls.category,
+            subcategory=cls.subcategories[i % len(cls.subcategories)],
+            slug=f'product{i}'
+        ) for i in range(QUERY_BUDGET_PRODUCTS))
+        cls.viewsets = [
+            (prefix, basename) for prefix, viewset, basename in router.registry
+            if issubclass(viewset, SarafanViewSet)
+        ]
+
+    def test_every_viewset_has_budget(self):
+        """
+        Тест наличия бюджета запросов у каждого наследника SarafanViewSet.
+        """
+        for _, basename in self.viewsets:
+            with self.subTest(basename=basename):
+                self.assertIn(basename, QUERY_BUDGETS)
+
+    def test_list_and_detail_within_budget(self):
+        """
+        Тест соблюдения бюджета запросов для списка, страницы
+        максимального размера и детального представления.
+        """
+        for _, basename in self.viewsets:
+            budget = QUERY_BUDGETS.get(basename)
+            list_url = reverse(f'api:{basename}-list')
+            with self.subTest(basename=basename, page='list'):
+                objects = self.assertQueryBudget(list_url, budget).json()
+            with self.subTest(basename=basename, page='limit'):
+                self.assertQueryBudget(
+                    list_url, budget + COUNT_QUERY + ESTIMATE_QUERY,
+                    data={'limit': QUERY_BUDGET_PAGE_LIMIT})
+            with self.subTest(basename=basename, page='cursor'):
+                self.assertQueryBudget(
+                    list_url, budget,
+                    data={'cursor': '', 'limit': QUERY_BUDGET_PAGE_LIMIT})
+            with self.subTest(basename=basename, page='detail'):
+                detail_url = reverse(f'api:{basename}-detail',
+                                     kwargs={'pk': objects[0]['id']})
+                self.assertQueryBudget(detail_url, budget)
+
+
+class TestCursorPagination(TestSarafanBaseCase):
+    """
+    Класс тестирования keyset-пагинации каталога.
+    """
+
+    def test_walk_subcategories_forward_and_back(self):
+        """
+        Тест обхода подкатегорий по курсору вперед и назад. Каждая запись
+        встречается ровно один раз, порядок совпадает с (created_at, id).
+        """
+        expected = list(Subcategory.objects.order_by(
+            'created_at', 'id').values_list('id', flat=True))
+        url = reverse('api:subcategories-list')
+        data = {'cursor': '', 'limit': CURSOR_PAGE_SIZE}
+        pages, seen = [], []
+        while url:
+            page = self.client.get(url, data=data).json()
+            self.assertNotIn('count', page)
+            pages.append(page)
+            seen.extend(item['id'] for item in page['results'])
+            url, data = page['next'], None
+        self.assertListEqual(expected, seen)
+
+        previous = self.client.get(pages[-1]['previous']).json()
+        self.assertEqual(previous['results'], pages[-2]['results'])
+
+    def test_invalid_cursor(self):
+        """
+        Тест обработки некорректного курсора.
+        """
+        response = self.client.get(reverse('api:products-list'),
+                                   data={'cursor': 'broken'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class TestListCount(TestSarafanBaseCase):
+    """
+    Класс тестирования кэшированного и оценочного числа записей в
+    пагинации limit/offset.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Product.objects.bulk_create(Product(
+            name=f'product{i}',
+            price=i + 1,
+            category=cls.category,
+            subcategory=cls.subcategories[0],
+            slug=f'product{i}'
+        ) for i in range(QUERY_BUDGET_PRODUCTS))
+
+    def test_count_cached_until_change(self):
+        """
+        Тест подсчета записей один раз для разных страниц одной выборки и
+        пересчета после изменения продукта.
+        """
+        url = reverse('api:products-list')
+        budget = QUERY_BUDGETS['products']
+        data = {'limit': CURSOR_PAGE_SIZE, 'count': 'exact'}
+        self.assertQueryBudget(url, budget + COUNT_QUERY, data=data)
+        page = self.assertQueryBudget(
+            url, budget, data={**data, 'offset': CURSOR_PAGE_SIZE}).json()
+        self.assertEqual(page['count'], QUERY_BUDGET_PRODUCTS)
+
+        Product.objects.first().delete()
+        page = self.client.get(url, data=data).json()
+        self.assertEqual(page['count'], QUERY_BUDGET_PRODUCTS - 1)
+
+    def test_small_selection_skips_estimate(self):
+        """
+        Тест пересчета небольшой выборки после изменения модели одним
+        запросом: прошлое точное число меньше порога, и статистика СУБД
+        не запрашивается.
+        """
+        url = reverse('api:products-list')
+        budget = QUERY_BUDGETS['products']
+        data = {'limit': CURSOR_PAGE_SIZE}
+        self.assertQueryBudget(url, budget + COUNT_QUERY + ESTIMATE_QUERY,
+                               data=data)
+        Product.objects.first().delete()
+        page = self.assertQueryBudget(url, budget + COUNT_QUERY,
+                                      data=data).json()
+        self.assertEqual(page['count'], QUERY_BUDGET_PRODUCTS - 1)
+
+    def test_count_none(self):
+        """
+        Тест списка без подсчета записей: count равен null, ссылка на
+        следующую страницу есть, пока записи не закончились.
+        """
+        url = reverse('api:products-list')
+        data = {'limit': QUERY_BUDGET_PRODUCTS - 1, 'count': 'none'}
+        page = self.assertQueryBudget(
+            url, QUERY_BUDGETS['products'], data=data).json()
+        self.assertIsNone(page['count'])
+        self.assertEqual(len(page['results']), QUERY_BUDGET_PRODUCTS - 1)
+        page = self.client.get(page['next']).json()
+        self.assertEqual(len(page['results']), 1)
+        self.assertIsNone(page['next'])
+        self.assertEqual(self.client.get(url, data={'count': 'all'}
+                                         ).status_code, HTTPStatus.BAD_REQUEST)
+
+    @override_settings(COUNT_ESTIMATE_THRESHOLD=1)
+    def test_count_estimate(self):
+        """
+        Тест оценки числа записей по статистике SQLite для большой
+        выборки и точного подсчета по запросу exact.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Product.objects.create(name='product', price=1, slug='product',
+                               category=self.category,
+                               subcategory=self.subcategories[0])
+        url = reverse('api:products-list')
+        for mode, count in (('estimate', QUERY_BUDGET_PRODUCTS),
+                            ('exact', QUERY_BUDGET_PRODUCTS + 1)):
+            with self.subTest(mode=mode):
+                page = self.client.get(url, data={'limit': 1, 'count': mode})
+                self.assertEqual(page.json()['count'], count)
+
+    @override_settings(COUNT_ESTIMATE_THRESHOLD=1)
+    def test_stale_estimate_keeps_rows_reachable(self):
+        """
+        Тест устаревшей оценки меньше реального числа записей: оценка
+        попадает только в count, следующие страницы и смещение за
+        оценкой по-прежнему отдают записи.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Product.objects.bulk_create(Product(
+            name=f'new{i}', price=1, slug=f'new{i}', category=self.category,
+            subcategory=self.subcategories[0]
+        ) for i in range(STALE_ESTIMATE_EXTRA))
+        url = reverse('api:products-list')
+        page = self.client.get(
+            url, data={'limit': QUERY_BUDGET_PRODUCTS}).json()
+        self.assertEqual(page['count'], QUERY_BUDGET_PRODUCTS)
+        self.assertEqual(len(page['results']), QUERY_BUDGET_PRODUCTS)
+        page = self.client.get(page['next']).json()
+        self.assertEqual(len(page['results']), STALE_ESTIMATE_EXTRA)
+        self.assertIsNone(page['next'])
+        page = self.client.get(url, data={
+            'limit': 1, 'offset': QUERY_BUDGET_PRODUCTS + 1}).json()
+        self.assertEqual(len(page['results']), 1)
+
+
+class TestCatalogResponseCache(TestSarafanBaseCase):
+    """
+    Класс тестирования кэша ответов каталога и ETag.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.product = Product.objects.create(
+            name='iPhone 13', price=799.99, category=cls.category,
+            subcategory=cls.subcategories[0], slug='iphone-13')
+        cls.url = reverse('api:products-list')
+
+    def test_repeat_request_served_from_cache(self):
+        """
+        Тест повторного запроса: ответ берется из кэша без запросов к
+        базе, а If-None-Match с текущим ETag возвращает 304.
+        """
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+            not_modified = self.client.get(
+                self.url, headers={'If-None-Match': etag})
+        self.assertEqual(cached.json(), response.json())
+        self.assertEqual(cached.headers['ETag'], etag)
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b'')
+
+    def test_model_change_invalidates_cache(self):
+        """
+        Тест инвалидации: изменение продукта меняет ETag и содержимое.
+        """
+        etag = self.client.get(self.url).headers['ETag']
+        self.product.name = 'iPhone 14'
+        self.product.save()
+        response = self.client.get(self.url,
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'iPhone 14')
+
+    def test_version_bump_from_other_process(self):
+        """
+        Тест версии, измененной через отдельный экземпляр кэша, как это
+        делает другой процесс: ответ и ETag меняются.
+        """
+        etag = self.client.get(self.url).headers['ETag']
+        Product.objects.filter(pk=self.product.pk).update(name='iPhone 15')
+        other_process_cache = caches.create_connection(DEFAULT_CACHE_ALIAS)
+        other_process_cache.incr(get_version_key(Product))
+        response = self.client.get(self.url,
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'iPhone 15')
+
+    @override_settings(CACHES={
+        **TEST_CACHES,
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_rejected(self):
+        """
+        Тест проверки api.E001: кэш ответов с LocMemCache запрещен.
+        """
+        errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['api.E001'])
+        self.assertEqual(errors[0].msg, SHARED_CACHE_REQUIRED)
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class TestImageUpload(TestSarafanBaseCase):
+    """
+    Класс тестирования загрузки изображений администратором.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create(username='admin', is_staff=True)
+        cls.url = reverse('api:categories-detail',
+                          kwargs={'pk': cls.category.pk})
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    @staticmethod
+    def get_image():
+        buffer = io.BytesIO()
+        Image.new('RGB', (1, 1)).save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def test_wrapped_base64(self):
+        """
+        Тест декодирования Base64 с переносами строк длиннее одной части.
+        """
+        content = os.urandom(BASE64_CHUNK_SIZE)
+        image = decode_base64_to_file(
+            base64.encodebytes(content).decode().replace('\n', '\r\n '),
+            name='wrapped.png', content_type='image/png')
+        self.assertEqual(image.read(), content)
+
+    def test_oversized_base64_not_copied(self):
+        """
+        Тест отклонения слишком большой строки Base64 без копирования ее
+        целиком: пик выделенной памяти меньше размера строки.
+        """
+        data = base64.encodebytes(
+            os.urandom(BASE64_UPLOAD_CHUNKS * BASE64_CHUNK_SIZE)).decode()
+        message = IMAGE_TOO_LARGE.format(BASE64_CHUNK_SIZE)
+        tracemalloc.start()
+        try:
+            with self.settings(MAX_IMAGE_UPLOAD_SIZE=BASE64_CHUNK_SIZE), \
+                    self.assertRaisesMessage(ValueError, message):
+                decode_base64_to_file(data, name='large.png',
+                                      content_type='image/png')
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, len(data) // 2)
+
+    def test_multipart_upload(self):
+        """
+        Тест загрузки изображения multipart-запросом.
+        """
+        image = SimpleUploadedFile('image.png', self.get_image(),
+                                   content_type='image/png')
+        response = self.client.patch(self.url, {'image': image},
+                                     format='multipart')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.category.refresh_from_db()
+        self.assertTrue(self.category.image.name.endswith('.png'))
+
+    def test_base64_upload(self):
+        """
+        Тест загрузки изображения строкой Base64 в режиме совместимости.
+        """
+        image = base64.b64encode(self.get_image()).decode()
+        response = self.client.patch(
+            self.url, {'image': f'data:image/png;base64,{image}'},
+            format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_upload_size_limit(self):
+        """
+        Тест отклонения изображений больше MAX_IMAGE_UPLOAD_SIZE в обоих
+        режимах загрузки.
+        """
+        image = self.get_image()
+        with self.settings(MAX_IMAGE_UPLOAD_SIZE=len(image) - 1):
+            response = self.client.patch(
+                self.url, {'image': SimpleUploadedFile(
+                    'image.png', image, content_type='image/png')},
+                format='multipart')
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+            encoded = base64.b64encode(image).decode()
+            response = self.client.patch(
+                self.url, {'image': f'data:image/png;base64,{encoded}'},
+                format='json')
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+            self.assertIn('image', response.json())
+
+    @override_settings(RENDITION_WORKERS=0)
+    def test_single_source_product_image(self):
+        """
+        Тест режима одного исходного изображения: размеры продукта
+        строятся из него после сохранения.
+        """
+        product = Product.objects.create(
+            name='iPhone 13', price=799.99, category=self.category,
+            subcategory=self.subcategories[0], slug='iphone-13')
+        buffer = io.BytesIO()
+        Image.new('RGB', (2000, 1000)).save(buffer, format='PNG')
+        response = self.client.patch(
+            reverse('api:products-detail', kwargs={'pk': product.pk}),
+            {'image': SimpleUploadedFile('source.png', buffer.getvalue(),
+                                         content_type='image/png')},
+            format='multipart')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        product.refresh_from_db()
+        for field, size in settings.PRODUCT_IMAGE_SIZES.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(product, field).width, size[0])
+
+    @override_settings(RENDITION_WORKERS=0, MEDIA_ROOT=tempfile.mkdtemp())
+    def test_source_image_keeps_uploaded_renditions(self):
+        """
+        Тест исходного изображения вместе с миниатюрой: миниатюра клиента
+        сохраняется, остальные размеры строятся, а исходник удаляется
+        после фиксации транзакции.
+        """
+        product = Product.objects.create(
+            name='iPhone 13', price=799.99, category=self.category,
+            subcategory=self.subcategories[0], slug='iphone-13')
+        buffer = io.BytesIO()
+        Image.new('RGB', (2000, 1000)).save(buffer, format='PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('api:products-detail', kwargs={'pk': product.pk}), {
+                    'image': SimpleUploadedFile(
+                        'source.png', buffer.getvalue(),
+                        content_type='image/png'),
+                    'thumbnail': SimpleUploadedFile(
+                        'thumbnail.png', self.get_image(),
+                        content_type='image/png'),
+                }, format='multipart')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        product.refresh_from_db()
+        self.assertEqual(product.thumbnail.width, 1)
+        self.assertEqual(product.medium.width,
+                         settings.PRODUCT_IMAGE_SIZES['medium'][0])
+        self.assertEqual(os.listdir(os.path.dirname(product.large.path)),
+                         [os.path.basename(product.large.name)])
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_derive_skips_existing_renditions(self):
+        """
+        Тест повторного построения размеров, как при втором запуске
+        warm_product_images --derive: готовые размеры не перекодируются.
+        """
+        product = Product.objects.create(
+            name='iPhone 13', price=799.99, category=self.category,
+            subcategory=self.subcategories[0], slug='iphone-13')
+        buffer = io.BytesIO()
+        Image.new('RGB', (2000, 1000)).save(buffer, format='PNG')
+        product.large.save('source.png', ContentFile(buffer.getvalue()))
+        self.assertEqual(derive_renditions(product), IMAGE_FIELDS)
+        names = [getattr(product, field).name for field in IMAGE_FIELDS]
+        product.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual(derive_renditions(product), ())
+        self.assertEqual(
+            [getattr(product, field).name for field in IMAGE_FIELDS], names)
+
+    def test_anonymous_cannot_upload(self):
+        """
+        Тест запрета загрузки для анонимного пользователя.
+        """
+        response = APIClient().patch(self.url, {}, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+
+class TestAsyncCatalog(TestSarafanBaseCase):
+    """
+    Класс тестирования асинхронных эндпоинтов каталога.
+    """
+
+    async def test_async_matches_sync(self):
+        """
+        Тест совпадения ответов асинхронных и синхронных эндпоинтов.
+        """
+        for basename in ('categories', 'subcategories'):
+            with self.subTest(basename=basename):
+                sync = await self.async_client.get(
+                    reverse(f'api:{basename}-list'))
+                response = await self.async_client.get(
+                    reverse(f'api:async-{basename}-list'))
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response.json(), sync.json())
+                detail = await self.async_client.get(reverse(
+                    f'api:async-{basename}-detail',
+                    kwargs={'pk': sync.json()[0]['id']}))
+                self.assertEqual(detail.json(), sync.json()[0])
+
+    async def test_async_not_found(self):
+        """
+        Тест ответа 404 для несуществующего объекта.
+        """
+        response = await self.async_client.get(
+            reverse('api:async-products-detail', kwargs={'pk': 1}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class TestProductSearch(TestSarafanBaseCase):
+    """
+    Класс тестирования полнотекстового поиска продуктов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.products = [Product.objects.create(
+            name=name, price=price, category=cls.category,
+            subcategory=cls.subcategories[i], slug=f'search-product-{i}'
+        ) for i, (name, price) in enumerate((
+            ('Смартфон Galaxy', 500), ('Чехол для смартфона', 20),
+            ('Ноутбук', 1500)))]
+        cls.url = reverse('api:products-search')
+
+    def search(self, **params):
+        response = self.client.get(self.url, data=params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [product['name'] for product in response.json()['results']]
+
+    def test_search_by_prefix_with_filters(self):
+        """
+        Тест поиска по префиксу слова с фильтрами по подкатегории и цене.
+        """
+        self.assertCountEqual(self.search(q='смартфон'),
+                              ['Смартфон Galaxy', 'Чехол для смартфона'])
+        self.assertEqual(self.search(q='смартф', price_max=100),
+                         ['Чехол для смартфона'])
+        self.assertEqual(
+            self.search(q='смартфон',
+                        subcategory=self.subcategories[0].pk),
+            ['Смартфон Galaxy'])
+        self.assertEqual(self.search(q='galaxy смартфон'),
+                         ['Смартфон Galaxy'])
+
+    def test_index_follows_product_changes(self):
+        """
+        Тест синхронизации индекса при изменении и удалении продукта.
+        """
+        product = self.products[2]
+        product.name = 'Игровой ноутбук'
+        product.save()
+        self.assertEqual(self.search(q='игровой'), ['Игровой ноутбук'])
+        product.delete()
+        self.assertEqual(self.search(q='ноутбук'), [])
+
+    def test_search_requires_query(self):
+        """
+        Тест обязательности параметра q.
+        """
+        response = self.client.get(self.url, data={'q': ' '})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class TestProductFiltering(TestSarafanBaseCase):
+    """
+    Класс тестирования фильтрации и сортировки списка продуктов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_category = Category.objects.create(
+            title='Одежда', slug='clothing')
+        Product.objects.bulk_create(Product(
+            name=f'filter-product{i}', price=price, category=cls.category,
+            subcategory=cls.subcategories[i % 2], slug=f'filter-product{i}'
+        ) for i, price in enumerate((300, 100, 200, 400)))
+        cls.url = reverse('api:products-list')
+
+    def get_names(self, **params):
+        response = self.client.get(self.url, data=params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [product['name'] for product in response.json()]
+
+    def test_filter_and_ordering(self):
+        """
+        Тест фильтров по подкатегории, категории, цене и сортировки.
+        """
+        self.assertEqual(
+            self.get_names(subcategory=self.subcategories[0].pk,
+                           ordering='-price'),
+            ['filter-product0', 'filter-product2'])
+        self.assertEqual(
+            self.get_names(price_min=150, price_max=350, ordering='price'),
+            ['filter-product2', 'filter-product0'])
+        self.assertEqual(self.get_names(category=self.other_category.pk), [])
+        response = self.client.get(self.url, data={'price_min': 'abc'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def get_query_plan(self, **params):
+        request = Request(APIRequestFactory().get(self.url, data=params))
+        view = ProductViewSet(action='list', format_kwarg=None,
+                              request=request)
+        return view.filter_queryset(view.get_queryset()).explain()
+
+    def test_queries_use_composite_indexes(self):
+        """
+        Тест плана запросов: фильтр с сортировкой обслуживается составным
+        индексом без полного сканирования и сортировки во временном
+        B-дереве.
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest('План запроса проверяется для SQLite.')
+        cases = (
+            ({'subcategory': self.subcategories[0].pk, 'ordering': 'price'},
+             'product_sub_price_idx'),
+            ({'category': self.category.pk, 'ordering': '-created_at'},
+             'product_cat_created_idx'),
+        )
+        for params, index in cases:
+            with self.subTest(index=index):
+                plan = self.get_query_plan(**params)
+                self.assertIn(f'USING INDEX {index}', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TestBenchmarkSuite(TestCase):
+    """
+    Класс тестирования генератора синтетических данных и прогона
+    бенчмарка по маршрутам API.
+    """
+
+    def test_every_route_has_scenario(self):
+        """
+        Тест покрытия: каждый маршрут api/urls.py либо имеет сценарий,
+        либо явно исключен из прогона.
+        """
+        user = User(pk=1, username='user')
+        product = Product(pk=1, name='Товар', category_id=1,
+                          subcategory_id=1)
+        tokens = dict.fromkeys(('password', 'access', 'refresh'), '')
+        routes = {scenario.route
+                  for scenario in build_scenarios(user, product, tokens)}
+        self.assertSetEqual(get_route_names() - EXCLUDED_ROUTES, routes)
+
+    def test_generate_and_compare_with_baseline(self):
+        """
+        Тест генерации данных пакетами и сравнения прогона с базой: число
+        запросов к БД не должно расти. Прогон записи в одну корзину
+        проходит без ошибок и потерянных обновлений.
+        """
+        call_command('generate_synthetic_data', categories=2,
+                     subcategories=2, products=BENCHMARK_PRODUCTS,
+                     users=BENCHMARK_USERS, cart_rows=BENCHMARK_CART_ROWS,
+                     batch_size=7, stdout=io.StringIO())
+        self.assertEqual(Product.objects.count(), BENCHMARK_PRODUCTS)
+        self.assertEqual(ShoppingCart.objects.count(), BENCHMARK_CART_ROWS)
+
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = f'{directory}/baseline.json'
+            options = {'concurrency': 1, 'requests': 2, 'warmup': 0,
+                       'route': ['products-list', 'shopping-cart'],
+                       'baseline': baseline, 'stdout': io.StringIO()}
+            call_command('benchmark_api', save_baseline=True, **options)
+            call_command('benchmark_api', tolerance=100, **options)
+            with open(baseline) as file:
+                results = json.load(file)['results']
+        self.assertSetEqual(set(results), {
+            'GET products-list', 'PUT shopping-cart',
+            'DELETE shopping-cart'})
+
+        output = io.StringIO()
+        call_command('benchmark_cart_contention', threads=1, iterations=2,
+                     stdout=output)
+        self.assertIn('ошибок: 0', output.getvalue())
+
+        regressed = {name: {**result, 'queries': result['queries'] + 1}
+                     for name, result in results.items()}
+        self.assertEqual(
+            len(compare_to_baseline(regressed, results, tolerance=100)),
+            len(results))
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1,
+                   CATALOG_CACHE_TIMEOUT=0)
+class TestProfilingMiddleware(TestSarafanBaseCase):
+    """
+    Класс тестирования профилирующего middleware и хранилища снимков.
+    """
+
+    def test_server_timing(self):
+        """
+        Тест заголовка Server-Timing: число и время SQL-запросов,
+        аутентификация, сериализация и рендеринг.
+        """
+        user = User.objects.create(**USER_CREDS)
+        token = AccessToken.for_user(user)
+        with override_settings(PROFILING_CPROFILE_RATE=0):
+            response = self.client.get(
+                reverse('api:subcategories-list'),
+                headers={'Authorization': f'Bearer {token}'})
+        timing = response['Server-Timing']
+        for metric in ('db;', 'auth;', 'serialize;', 'render;', 'total;'):
+            self.assertIn(metric, timing)
+        queries = QUERY_BUDGETS['subcategories'] + AUTH_QUERY
+        self.assertIn(f'desc="{queries} queries"', timing)
+        self.assertNotIn('X-Profile', response)
+
+        with override_settings(PROFILING_ENABLED=False):
+            response = self.client.get(reverse('api:subcategories-list'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_profile_store_rotation_and_diff(self):
+        """
+        Тест снимков cProfile: хранится не больше заданного числа
+        последних снимков, два снимка можно сравнить командой profiles.
+        """
+        url = reverse('api:categories-list')
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+                PROFILING_CPROFILE_RATE=1, PROFILING_STORE_DIR=directory,
+                PROFILING_STORE_MAX_FILES=PROFILING_STORE_MAX_FILES):
+            names = [self.client.get(url)['X-Profile']
+                     for _ in range(PROFILING_STORE_MAX_FILES + 1)]
+            self.assertListEqual(ProfileStore().list(), names[1:])
+            output = io.StringIO()
+            call_command('profiles', '--store', directory, '--limit',
+                         '1000', 'diff', names[-2], names[-1],
+                         stdout=output)
+        self.assertIn('(dispatch)', output.getvalue())
+
+
+class TestReadReplicaRouter(TestSarafanBaseCase):
+    """
+    Класс тестирования маршрутизации чтений каталога на реплики.
+    """
+
+    class Router(ReadReplicaRouter):
+        down = set()
+
+        def check_health(self, alias):
+            return alias not in self.down
+
+    def test_round_robin_and_fallback(self):
+        """
+        Тест выбора реплик по кругу, пропуска недоступной реплики и
+        возврата к основной базе, когда реплик не осталось.
+        """
+        router = self.Router(replicas=('replica_0', 'replica_1'),
+                             retry_seconds=60)
+        self.assertIsNone(router.db_for_read(Product))
+        with use_replicas():
+            self.assertListEqual(
+                [router.db_for_read(Product) for _ in range(3)],
+                ['replica_0', 'replica_1', 'replica_0'])
+            self.assertIsNone(router.db_for_read(ShoppingCart))
+            router.down = {'replica_1'}
+            self.assertListEqual(
+                [router.db_for_read(Category) for _ in range(2)],
+                ['replica_0', 'replica_0'])
+            router.down = {'replica_0', 'replica_1'}
+            self.assertEqual(router.db_for_read(Subcategory), 'default')
+        self.assertEqual(router.db_for_write(Product), 'default')
+        self.assertFalse(router.allow_migrate('replica_0', 'product'))
+
+    def test_catalog_write_pins_user_to_primary(self):
+        """
+        Тест закрепления за основной базой после записи в каталог и
+        отсутствия закрепления после записи в корзину.
+        """
+        admin = User.objects.create(username='admin', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        client.post(reverse('api:shopping-cart', kwargs={
+            'product_pk': Product.objects.create(
+                name='iPhone 15', price=999.99, category=self.category,
+                subcategory=self.subcategories[0], slug='iphone-15').pk
+        }), POST_SHOPPING_CART, format='json')
+        self.assertFalse(is_pinned_to_primary(admin))
+        client.patch(reverse('api:categories-detail',
+                             kwargs={'pk': self.category.pk}),
+                     {'title': 'renamed'}, format='json')
+        self.assertTrue(is_pinned_to_primary(admin))
+
+    def test_cache_fill_after_change_reads_primary(self):
+        """
+        Тест ответа для кэша, который в течение REPLICA_LAG_SECONDS после
+        изменения читается из основной базы, а позже — с реплик.
+        """
+        reads = []
+
+        def handler(request):
+            reads.append(replica_reads.get())
+            return Response([])
+
+        view = ProductViewSet()
+        request = Request(APIRequestFactory().get('/'))
+        request.accepted_media_type = 'application/json'
+        with use_replicas():
+            bump_version(Product)
+            view.get_cached_response(handler, request)
+            with override_settings(REPLICA_LAG_SECONDS=0):
+                bump_version(Product)
+                view.get_cached_response(handler, request)
+        self.assertListEqual(reads, [False, True])
+
+
+@override_settings(CATALOG_CACHE_TIMEOUT=0)
+class TestFastListRepresentation(TestSarafanBaseCase):
+    """
+    Контрактный тест быстрого представления списков: ответ, построенный
+    из values() и отрендеренный SarafanJSONRenderer, совпадает байт в
+    байт с ответом сериализаторов, отрендеренным JSONRenderer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        images = {field: f'images/products/{field}/фото {field}.jpg'
+                  for field in IMAGE_FIELDS}
+        Product.objects.bulk_create(Product(
+            name=f'Товар "{i}"', price=f'{i}.5', slug=f'parity-{i}',
+            category=cls.category, subcategory=cls.subcategories[i % 2],
+            **{**images, 'thumbnail': '' if i % 2 else images['thumbnail']}
+        ) for i in range(1, 4))
+
+    def test_output_parity(self):
+        """
+        Тест списков продуктов, поиска, категорий и подкатегорий с
+        пагинацией limit/offset и курсором.
+        """
+        urls = (
+            reverse('api:products-list'),
+            reverse('api:products-list') + '?limit=2&ordering=-price',
+            reverse('api:products-list') + '?cursor=&limit=2',
+            reverse('api:products-search') + '?q=Товар',
+            reverse('api:categories-list') + '?limit=3&offset=1',
+            reverse('api:subcategories-list'),
+            reverse('api:products-list') + '?fields=id,name,price,thumbnail',
+            reverse('api:products-list') + '?omit=images,category',
+            reverse('api:categories-list') + '?fields=title,subcategories',
+            reverse('api:subcategories-list') + '?omit=image',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                fast = self.client.get(url)
+                with override_settings(FAST_LIST_REPRESENTATION=False):
+                    slow = self.client.get(url)
+                self.assertEqual(fast.status_code, HTTPStatus.OK)
+                self.assertEqual(fast.content,
+                                 JSONRenderer().render(slow.data))
+                self.assertEqual(fast.content, slow.content)
+
+    def test_renderer_parity(self):
+        """
+        Тест рендерера на типах, которые orjson кодирует иначе, чем DRF.
+        """
+        data = {'text': 'строка\u2028', 'price': Decimal('1.10'),
+                'created_at': timezone.now(), 1: [None, True, 1.5],
+                'lazy': gettext_lazy('Not found.')}
+        self.assertEqual(SarafanJSONRenderer().render(data),
+                         JSONRenderer().render(data))
+
+    @skipIf(orjson is None, 'orjson не установлен')
+    def test_renderer_float_format(self):
+        """
+        Тест закрепленного формата чисел с плавающей точкой, которые
+        orjson кодирует иначе, чем JSONRenderer.
+        """
+        data = {'small': 1e-7, 'large': 1e16, 'decimal': Decimal('1E-7'),
+                'nan': float('nan'), 'infinity': float('inf')}
+        self.assertEqual(
+            SarafanJSONRenderer().render(data),
+            b'{"small":1e-7,"large":1e+16,"decimal":1e-7,"nan":null,'
+            b'"infinity":null}')
+
+
+class TestSparseFields(TestSarafanBaseCase):
+    """
+    Класс тестирования параметров fields и omit в каталоге.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.product = Product.objects.create(
+            name='product', price=1, slug='product', category=cls.category,
+            subcategory=cls.subcategories[0],
+            thumbnail='images/products/thumbnail.jpg')
+
+    def test_product_fields(self):
+        """
+        Тест списка и детального представления продукта с выбранными
+        полями: в ответе и в SQL нет колонок и соединений остальных полей.
+        """
+        urls = (reverse('api:products-list'),
+                reverse('api:products-detail',
+                        kwargs={'pk': self.product.pk}))
+        for url in urls:
+            for fast in (True, False):
+                with self.subTest(url=url, fast=fast), override_settings(
+                        FAST_LIST_REPRESENTATION=fast), \
+                        CaptureQueriesContext(connection) as queries:
+                    cache.clear()
+                    response = self.client.get(
+                        url, {'fields': 'id,name,price,thumbnail'})
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+                    data = response.json()
+                    item = data[0] if isinstance(data, list) else data
+                    self.assertEqual(set(item),
+                                     {'id', 'name', 'price', 'images'})
+                    self.assertEqual(set(item['images'][0]), {'thumbnail'})
+                    sql = queries[-1]['sql']
+                    self.assertNotIn('"medium"', sql)
+                    self.assertNotIn('category_category', sql)
+
+    def test_omit_and_unknown_fields(self):
+        """
+        Тест исключения полей параметром omit и ошибки для неизвестных
+        полей.
+        """
+        url = reverse('api:categories-list')
+        item = self.client.get(url, {'omit': 'image,subcategories'}).json()[0]
+        self.assertEqual(set(item), {'id', 'slug', 'created_at', 'title'})
+        for params in ({'fields': 'title,price'}, {'omit': 'unknown'},
+                       {'fields': 'title', 'omit': 'title'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code,
+                                 HTTPStatus.BAD_REQUEST)
+
+    def test_cursor_with_fields(self):
+        """
+        Тест keyset-пагинации с выбранными полями: ключ курсора
+        выбирается из базы, но в ответ попадают только запрошенные поля.
+        """
+        endpoints = (('api:products-list', 'name'),
+                     ('api:categories-list', 'title'),
+                     ('api:subcategories-list', 'title'))
+        for name, field in endpoints:
+            for fast in (True, False):
+                with self.subTest(endpoint=name, fast=fast), \
+                        override_settings(FAST_LIST_REPRESENTATION=fast):
+                    cache.clear()
+                    url = reverse(name)
+                    data = {'cursor': '', 'limit': 1, 'fields': field}
+                    while url:
+                        response = self.client.get(url, data)
+                        self.assertEqual(response.status_code, HTTPStatus.OK)
+                        page = response.json()
+                        for item in page['results']:
+                            self.assertEqual(set(item), {field})
+                        url, data = page['next'], None
+
+
+class TestImportCatalog(TestSarafanBaseCase):
+    """
+    Класс тестирования потокового импорта каталога.
+    """
+
+    class InterruptedImport(import_catalog.Command):
+        """Импорт, прерывающийся на второй пачке."""
+
+        def flush(self, batch):
+            if getattr(self, 'flushed', False):
+                raise KeyboardInterrupt
+            super().flush(batch)
+            self.flushed = True
+
+    def write_feed(self, directory, records):
+        path = os.path.join(directory, 'feed.jsonl')
+        with open(path, 'w') as file:
+            for record in records:
+                file.write(f'{json.dumps(record, ensure_ascii=False)}\n')
+        return path
+
+    def test_resume_after_interruption(self):
+        """
+        Тест продолжения импорта с контрольной точки, upsert по slug,
+        отклонения некорректных строк и обновления поискового индекса.
+        """
+        subcategory = self.subcategories[0]
+        Product.objects.create(
+            name='Старое название', price=1, category=self.category,
+            subcategory=subcategory, slug='import-0')
+        records = [{
+            'slug': f'import-{i}', 'name': f'Импортный товар {i}',
+            'price': f'{i + 1}.50', 'category': self.category.slug,
+            'subcategory': subcategory.slug,
+            'large': f'images/products/large/import-{i}.jpg',
+        } for i in range(IMPORT_BATCH_SIZE * 3)]
+        records.insert(1, {**records[0], 'slug': 'bad', 'price': '0'})
+        records.insert(2, {**records[0], 'slug': 'x', 'subcategory': '?'})
+        options = {'batch_size': IMPORT_BATCH_SIZE, 'stdout': io.StringIO(),
+                   'stderr': io.StringIO()}
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_feed(directory, records)
+            with self.assertRaises(KeyboardInterrupt):
+                call_command(self.InterruptedImport(), path, **options)
+            self.assertTrue(os.path.exists(f'{path}.checkpoint'))
+            self.assertEqual(Product.objects.filter(
+                slug__startswith='import-').count(), IMPORT_BATCH_SIZE)
+
+            call_command('import_catalog', path, **options)
+            self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+        self.assertIn(f'Строк: {len(records)}, импортировано: '
+                      f'{IMPORT_BATCH_SIZE * 3}, отклонено: 2',
+                      options['stdout'].getvalue())
+        products = Product.objects.filter(slug__startswith='import-')
+        self.assertEqual(products.count(), IMPORT_BATCH_SIZE * 3)
+        updated = products.get(slug='import-0')
+        self.assertEqual(updated.name, 'Импортный товар 0')
+        self.assertEqual(updated.large.name, records[0]['large'])
+        self.assertEqual(updated.category, self.category)
+        self.assertEqual(search_products(
+            Product.objects.all(), 'Импортный').count(),
+            IMPORT_BATCH_SIZE * 3)
+        self.assertFalse(search_products(Product.objects.all(),
+                                         'Старое').exists())
+
+    def test_invalidation_after_commit(self):
+        """
+        Тест сброса итогов корзин и версии продуктов только после
+        фиксации транзакции пачки.
+        """
+        user = User.objects.create(**USER_CREDS)
+        product = Product.objects.create(
+            name='Товар', price=1, category=self.category,
+            subcategory=self.subcategories[0], slug='import-0')
+        ShoppingCart.objects.create(user=user, product=product, amount=1,
+                                    is_in_shopping_cart=True)
+        cart_summary.build_lines(user.pk)
+        version = get_versions(Product)
+        records = [{'slug': 'import-0', 'name': 'Товар', 'price': '2.00',
+                    'category': self.category.slug,
+                    'subcategory': self.subcategories[0].slug}]
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_feed(directory, records)
+            with self.captureOnCommitCallbacks() as callbacks:
+                call_command('import_catalog', path, stdout=io.StringIO())
+        self.assertIsNotNone(cache.get(cart_summary.get_key(user.pk)))
+        self.assertEqual(get_versions(Product), version)
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(cart_summary.get_key(user.pk)))
+        self.assertNotEqual(get_versions(Product), version)
+
+
+class TestCatalogExport(TestSarafanBaseCase):
+    """
+    Класс тестирования потоковой выгрузки каталога.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create(username='admin', is_staff=True)
+        cls.products = [Product.objects.create(
+            name=f'Товар {i}', price=i + 1, category=cls.category,
+            subcategory=cls.subcategories[0], slug=f'export-{i}'
+        ) for i in range(3)]
+        cls.since = timezone.now() - timedelta(days=1)
+        Product.objects.filter(pk=cls.products[0].pk).update(
+            updated_at=cls.since - timedelta(days=1))
+        cls.url = reverse('api:products-export')
+
+    def test_export_endpoint(self):
+        """
+        Тест полной и инкрементальной выгрузки администратором и запрета
+        выгрузки остальным пользователям.
+        """
+        self.assertEqual(self.client.get(self.url).status_code,
+                         HTTPStatus.UNAUTHORIZED)
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(
+            response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['slug'] for row in rows],
+                         [product.slug for product in self.products])
+        self.assertEqual(rows[0]['subcategory'], self.subcategories[0].slug)
+        self.assertEqual(rows[0]['price'], '1.00')
+
+        response = client.get(self.url, {
+            'file_format': 'csv', 'updated_since': self.since.isoformat()})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'slug', 'name'])
+        self.assertEqual([line.split(',')[1] for line in lines[1:]],
+                         [product.slug for product in self.products[1:]])
+        self.assertEqual(client.get(self.url, {
+            'updated_since': 'вчера'}).status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_export_command_round_trip(self):
+        """
+        Тест выгрузки командой в файл, который import_catalog загружает
+        обратно без ошибок.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.csv')
+            call_command('export_catalog', output=path, chunk_size=2,
+                         stdout=io.StringIO())
+            Product.objects.filter(pk=self.products[1].pk).update(name='-')
+            stdout = io.StringIO()
+            call_command('import_catalog', path, stdout=stdout,
+                         stderr=io.StringIO())
+        self.assertIn('импортировано: 3, отклонено: 0', stdout.getvalue())
+        self.assertEqual(Product.objects.get(pk=self.products[1].pk).name,
+                         self.products[1].name)
+
+
+class TestCachedAuthentication(TestSarafanBaseCase):
+    """
+    Класс тестирования кэша пользователей JWT-аутентификации и отзыва
+    токенов.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(**USER_CREDS)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.url = reverse('api:shopping-cart-info-get-summary')
+
+    def get_user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, [query['sql'] for query in queries
+                          if User._meta.db_table in query['sql']]
+
+    def test_cached_user_and_invalidation(self):
+        """
+        Тест аутентификации без запросов к базе после первого запроса и
+        сброса кэша при деактивации пользователя.
+        """
+        response, queries = self.get_user_queries()
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(queries), AUTH_QUERY)
+        response, queries = self.get_user_queries()
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertListEqual(queries, [])
+
+        self.user.is_active = False
+        self.user.save()
+        response, queries = self.get_user_queries()
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(len(queries), AUTH_QUERY)
+
+    def test_revoked_token(self):
+        """
+        Тест отказа в доступе по отозванному токену.
+        """
+        response = self.client.post(reverse('api:jwt-revoke'))
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(response.data['detail'], TOKEN_REVOKED)
+
+    def test_revocation_visible_to_other_processes(self):
+        """
+        Тест отзыва, видимого через отдельный экземпляр кэша, как в
+        другом процессе или после перезапуска, и не зависящего от
+        очистки кэша по умолчанию.
+        """
+        token = AccessToken.for_user(self.user)
+        revoke_token(token)
+        cache.clear()
+        other_process_cache = caches.create_connection(
+            settings.REVOCATION_CACHE_ALIAS)
+        self.assertTrue(other_process_cache.get(
+            REVOKED_TOKEN_KEY.format(token['jti'])))
+        self.assertTrue(is_token_revoked(token))
+
+    def test_unreliable_revocation_store_fails_closed(self):
+        """
+        Тест отказа в аутентификации по токену и ошибки api.E001, когда
+        список отозванных токенов хранится в памяти процесса или в кэше,
+        который вытесняет записи.
+        """
+        alias = settings.REVOCATION_CACHE_ALIAS
+        stores = (
+            {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            {**settings.CACHES[alias], 'OPTIONS': {}},
+        )
+        for store in stores:
+            with self.subTest(backend=store['BACKEND']), override_settings(
+                    CACHES={**settings.CACHES, alias: store}):
+                response = self.client.get(self.url)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.UNAUTHORIZED)
+                self.assertEqual(response.data['detail'],
+                                 REVOCATION_STORE_UNAVAILABLE)
+                self.assertEqual(
+                    [error.msg for error in check_shared_cache(None)],
+                    [REVOCATION_STORE_UNAVAILABLE])
+
+
+@override_settings(THROTTLE_BURSTS=THROTTLE_BURSTS, REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': THROTTLE_RATES})
+class TestThrottling(TestSarafanBaseCase):
+    """
+    Класс тестирования ограничения запросов клиентов и контроля
+    допуска запросов.
+    """
+
+    def test_token_buckets(self):
+        """
+        Тест отдельных ведер для каждого клиента и для бюджетов catalog и
+        cart, ответа 429 с Retry-After при исчерпании ведра.
+        """
+        url = reverse('api:categories-list')
+        burst = THROTTLE_BURSTS['catalog']
+        for _ in range(burst):
+            self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client.get(
+            url, REMOTE_ADDR='10.0.0.1').status_code, HTTPStatus.OK)
+
+        user = User.objects.create(**USER_CREDS)
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        self.assertEqual(client.get(url).status_code, HTTPStatus.OK)
+        clear_url = reverse('api:clear-shopping-cart')
+        for _ in range(THROTTLE_BURSTS['cart']):
+            self.assertEqual(client.delete(clear_url).status_code,
+                             HTTPStatus.NO_CONTENT)
+        self.assertEqual(client.delete(clear_url).status_code,
+                         HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(client.get(url).status_code, HTTPStatus.OK)
+
+    @override_settings(ADMISSION_MAX_CONCURRENCY=1,
+                       ADMISSION_QUEUE_TIMEOUT=0.01)
+    def test_admission_control(self):
+        """
+        Тест ответа 503 с Retry-After, когда место для запроса не
+        освободилось за время ожидания в очереди.
+        """
+        started, release = threading.Event(), threading.Event()
+
+        def get_response(request):
+            if not started.is_set():
+                started.set()
+                release.wait(5)
+            return HttpResponse()
+
+        middleware = AdmissionControlMiddleware(get_response)
+        request = APIRequestFactory().get('/')
+        worker = threading.Thread(target=middleware, args=(request,))
+        worker.start()
+        started.wait(5)
+        response = middleware(request)
+        self.assertEqual(response.status_code, HTTPStatus.SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'],
+                         str(settings.ADMISSION_RETRY_AFTER))
+        release.set()
+        worker.join()
+        self.assertEqual(middleware(request).status_code, HTTPStatus.OK)
+
+
+class TestAdmin(TestSarafanBaseCase):
+    """
+    Класс тестирования списков админки на больших таблицах.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser(**USER_CREDS)
+        products = Product.objects.bulk_create(Product(
+            name=f'product{i}',
+            price=i + 1,
+            category=cls.category,
+            subcategory=cls.subcategories[i % len(cls.subcategories)],
+            slug=f'product{i}'
+        ) for i in range(QUERY_BUDGET_PRODUCTS))
+        ShoppingCart.objects.bulk_create(ShoppingCart(
+            user=cls.admin, product=product, amount=1,
+            is_in_shopping_cart=True) for product in products)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    @override_settings(COUNT_ESTIMATE_THRESHOLD=1)
+    def test_changelists_use_estimated_count(self):
+        """
+        Тест списков продуктов и корзин без COUNT(*), без выборки всех
+        значений для фильтров и с постоянным числом запросов при оценке
+        размера таблицы по статистике.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        for model in (Product, ShoppingCart):
+            url = reverse(
+                f'admin:{model._meta.app_label}_'
+                f'{model._meta.model_name}_changelist')
+            with self.subTest(model=model.__name__), \
+                    CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response.context['cl'].result_count,
+                                 QUERY_BUDGET_PRODUCTS)
+                self.assertLessEqual(len(queries), ADMIN_CHANGELIST_QUERIES)
+                self.assertFalse(any('COUNT(' in query['sql']
+                                     for query in queries))
+                self.assertFalse(any('DISTINCT' in query['sql']
+                                     for query in queries))
+
+    def test_product_search(self):
+        """Тест поиска продуктов в админке по полнотекстовому индексу."""
+        response = self.client.get(
+            reverse('admin:product_product_changelist'), {'q': 'product1'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            {product.slug for product in response.context['cl'].result_list},
+            {product.slug for product in search_products(
+                Product.objects.all(), 'product1')})
+
+    def test_list_editable_autocomplete(self):
+        """
+        Тест редактирования подкатегории продукта из списка: виджет
+        автодополнения показывает текущую подкатегорию строки.
+        """
+        url = reverse('admin:product_product_changelist')
+        response = self.client.get(url)
+        formset = response.context['cl'].formset
+        form = formset.forms[0]
+        self.assertContains(
+            response, f'<option value="{form.instance.subcategory.pk}" '
+                      f'selected>{form.instance.subcategory}</option>')
+        data = {}
+        for row in formset.forms:
+            for name in row.fields:
+                value = row[name].value()
+                data[row.add_prefix(name)] = '' if value is None else value
+        new_subcategory = next(
+            subcategory for subcategory in self.subcategories
+            if subcategory != form.instance.subcategory)
+        data[form.add_prefix('subcategory')] = new_subcategory.pk
+        data.update({
+            f'{formset.prefix}-TOTAL_FORMS': len(formset.forms),
+            f'{formset.prefix}-INITIAL_FORMS': len(formset.forms),
+            '_save': 'Save',
+        })
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        form.instance.refresh_from_db()
+        self.assertEqual(form.instance.subcategory, new_subcategory)
@@ -0,0 +1,129 @@
+import math
+import time
+from itertools import count
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+THROTTLE_KEY = 'throttle:{}:{}'
+SWEEP_INTERVAL = 1000
+
+
+def parse_rate(rate):
+    """
+    Разбирает скорость в формате DRF 'число/период' и возвращает число
+    токенов в секунду.
+    """
+    num, period = rate.split('/')
+    duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+    return int(num) / duration
+
+
+def take_token(state, now, rate, capacity):
+    """
+    Пополняет ведро из состояния, начинающегося с (токены, время), на
+    прошедшее время и забирает один токен. Возвращает новое состояние
+    и время ожидания до следующего токена, 0 — если запрос пропущен.
+    """
+    tokens, updated = state[:2] if state else (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / rate
+
+
+class LocalBucketStore:
+    """
+    Ведра в памяти процесса без блокировок: состояние — неизменяемый
+    кортеж, который заменяется целиком одной операцией словаря. При
+    гонке потоков один из них может пропустить лишний запрос, что
+    допустимо для ограничения нагрузки. Ведра, которые успели
+    наполниться, периодически удаляются.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._calls = count()
+
+    def consume(self, key, rate, capacity):
+        now = time.monotonic()
+        state, wait = take_token(self._buckets.get(key), now, rate,
+                                 capacity)
+        self._buckets[key] = (*state, now + (capacity - state[0]) / rate)
+        if not next(self._calls) % SWEEP_INTERVAL:
+            self.sweep(now)
+        return wait
+
+    def sweep(self, now):
+        for key, (_, _, full_at) in list(self._buckets.items()):
+            if full_at <= now:
+                self._buckets.pop(key, None)
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Ведра в общем кэше для нескольких процессов. Чтение и запись не
+    атомарны, поэтому при одновременных запросах одного клиента лимит
+    соблюдается приблизительно.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def consume(self, key, rate, capacity):
+        now = time.time()
+        state, wait = take_token(self.cache.get(key), now, rate, capacity)
+        self.cache.set(key, state, math.ceil(capacity / rate))
+        return wait
+
+    def clear(self):
+        self.cache.clear()
+
+
+_store = None
+
+
+def get_bucket_store():
+    """
+    Возвращает хранилище ведер: общий кэш THROTTLE_SHARED_CACHE, если он
+    задан, иначе память процесса.
+    """
+    global _store
+    if _store is None:
+        alias = settings.THROTTLE_SHARED_CACHE
+        _store = CacheBucketStore(alias) if alias else LocalBucketStore()
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Ограничивает запросы клиента алгоритмом token bucket. Бюджет
+    выбирается по атрибуту throttle_scope представления: скорость
+    пополнения берется из DEFAULT_THROTTLE_RATES, емкость ведра — из
+    THROTTLE_BURSTS. Клиент определяется по id пользователя, а для
+    анонимных запросов — по IP. Представления без throttle_scope не
+    ограничиваются.
+    """
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope or not settings.THROTTLE_ENABLED:
+            return True
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES[scope])
+        if request.user.is_authenticated:
+            client = f'user:{request.user.pk}'
+        else:
+            client = f'ip:{self.get_ident(request)}'
+        self.wait_seconds = get_bucket_store().consume(
+            THROTTLE_KEY.format(scope, client), rate,
+            settings.THROTTLE_BURSTS[scope])
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,70 @@
+import base64
+import re
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+from .constants import IMAGE_TOO_LARGE
+
+BASE64_CHUNK_SIZE = 64 * 1024
+NON_BASE64_RE = re.compile(r'[^A-Za-z0-9+/=]')
+
+
+class UploadTooLarge(MultiPartParserError):
+    pass
+
+
+class SizeLimitedUploadHandler(FileUploadHandler):
+    """
+    Обработчик загрузки, прерывающий прием файла, размер которого
+    превышает MAX_IMAGE_UPLOAD_SIZE. Ставится перед
+    TemporaryFileUploadHandler: данные идут на диск по частям, а
+    слишком большой файл отклоняется до чтения его целиком.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.max_size = settings.MAX_IMAGE_UPLOAD_SIZE
+        if self.content_length and self.content_length > self.max_size:
+            raise UploadTooLarge(IMAGE_TOO_LARGE.format(self.max_size))
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            raise UploadTooLarge(IMAGE_TOO_LARGE.format(self.max_size))
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def decode_base64_to_file(data, name, content_type):
+    """
+    Декодирует строку Base64 во временный файл на диске частями по
+    BASE64_CHUNK_SIZE символов, не копируя строку целиком. Переносы
+    строк и другие символы вне алфавита Base64 удаляются в каждой части,
+    как их пропускает b64decode, а неполная группа из четырех символов
+    переносится в следующую часть. Размер результата проверяется до
+    декодирования каждой части.
+    """
+    max_size = settings.MAX_IMAGE_UPLOAD_SIZE
+    image = TemporaryUploadedFile(name, content_type, 0, None)
+    rest = ''
+    try:
+        for start in range(0, len(data), BASE64_CHUNK_SIZE):
+            chunk = rest + NON_BASE64_RE.sub(
+                '', data[start:start + BASE64_CHUNK_SIZE])
+            end = len(chunk) - len(chunk) % 4
+            rest = chunk[end:]
+            if image.tell() + end * 3 // 4 > max_size:
+                raise ValueError(IMAGE_TOO_LARGE.format(max_size))
+            image.write(base64.b64decode(chunk[:end]))
+        if rest:
+            image.write(base64.b64decode(rest))
+    except ValueError:
+        image.close()
+        raise
+    image.size = image.tell()
+    image.seek(0)
+    return image
@@ -5,7 +5,10 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
 from .views import (ProductViewSet, CategoryViewSet, ShoppingCartGeneric,
-                    SubcategoryViewSet, ShoppingCartViewSet, ClearShoppingCart)
+                    SubcategoryViewSet, ShoppingCartViewSet, ClearShoppingCart,
+                    ShoppingCartBatch, RevokeToken)
+from .async_views import (AsyncProductView, AsyncCategoryView,
+                          AsyncSubcategoryView)
 
 
 app_name = 'api'
@@ -24,12 +27,25 @@ urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.jwt')),
+    path('auth/jwt/revoke/', RevokeToken.as_view(), name='jwt-revoke'),
     path('shopping-cart/<int:product_pk>', ShoppingCartGeneric.as_view(),
          name='shopping-cart'),
+    path('shopping-cart/batch/', ShoppingCartBatch.as_view(),
+         name='shopping-cart-batch'),
     path('shopping-cart/clear/', ClearShoppingCart.as_view(),
          name='clear-shopping-cart'),
 ]
 
+async_views = (('products', AsyncProductView),
+               ('categories', AsyncCategoryView),
+               ('subcategories', AsyncSubcategoryView))
+for prefix, view in async_views:
+    urlpatterns += [
+        path(f'async/{prefix}/', view.as_view(), name=f'async-{prefix}-list'),
+        path(f'async/{prefix}/<int:pk>/', view.as_view(),
+             name=f'async-{prefix}-detail'),
+    ]
+
 schema_view = get_schema_view(
     openapi.Info(
         title='Store API',
@@ -0,0 +1,64 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'model-version:{}'
+CHANGED_KEY = 'model-changed:{}'
+
+
+def get_version_key(model):
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def get_versions(*models):
+    """
+    Возвращает кортеж текущих версий моделей. Отсутствующая в кэше версия
+    инициализируется текущим временем, чтобы не совпасть с уже
+    выданными ранее значениями.
+    """
+    keys = [get_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def bump_version(*models):
+    """
+    Увеличивает версии моделей после изменения их данных и отмечает
+    модели измененными на REPLICA_LAG_SECONDS.
+    """
+    for model in models:
+        key = get_version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+    cache.set_many(
+        {CHANGED_KEY.format(model._meta.label_lower): True
+         for model in models}, settings.REPLICA_LAG_SECONDS)
+
+
+def changed_recently(*models):
+    """
+    Проверяет, менялась ли одна из моделей за последние
+    REPLICA_LAG_SECONDS, то есть могут ли реплики еще не содержать
+    изменение.
+    """
+    return bool(cache.get_many(
+        [CHANGED_KEY.format(model._meta.label_lower) for model in models]))
+
+
+def bump_version_on_commit(*models):
+    """
+    Увеличивает версии сразу и еще раз после фиксации транзакции, чтобы
+    ответ, прочитанный другим процессом до фиксации, не закэшировался
+    под последней версией.
+    """
+    bump_version(*models)
+    transaction.on_commit(partial(bump_version, *models))
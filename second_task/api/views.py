@@ -1,31 +1,75 @@
+from decimal import Decimal
+
 from django.contrib.auth import get_user_model
 from rest_framework import viewsets, status, generics
-from django.db.models import Sum, F, Value, ExpressionWrapper, DecimalField
-from django.db.models.functions import Coalesce
+from django.db.models import F, ExpressionWrapper, DecimalField
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 
 from rest_framework.response import Response
+from product.export import CONTENT_TYPES, export_catalog, get_export_queryset
 from product.models import Product, ShoppingCart
+from product.search import search_products
 from category.models import Category, Subcategory
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from .permissions import ReadOrAdminOnly, AuthorOnly
-from .pagination import SarafanPageNumberPagination
+from .pagination import (SarafanPageNumberPagination,
+                         SarafanCursorPagination, SarafanSearchPagination)
+from . import cart_summary
+from .authentication import revoke_token
+from .conflicts import retry_on_conflict
+from .category_tree import category_tree
+from .mixins import (CachedResponseMixin, PrimaryPinMixin, ReplicaReadMixin,
+                     SparseFieldsMixin, ValuesListMixin)
+from .representations import (CategoryRepresentation, ProductRepresentation,
+                              SubcategoryRepresentation)
 from .serializers import (ProductSerializer, CategorySerializer,
                           ShoppingCartPostPutDeleteSerializer,
-                          SubcategorySerializer)
-from .constants import SUCCESS_MESSAGE
+                          SubcategorySerializer,
+                          ShoppingCartBatchItemSerializer,
+                          ProductExportSerializer)
+from .constants import SUCCESS_MESSAGE, SEARCH_QUERY_REQUIRED
+from .filters import ProductFilterBackend, SarafanOrderingFilter
 
 User = get_user_model()
 
 
-class SarafanViewSet(viewsets.ModelViewSet):
+class SarafanViewSet(PrimaryPinMixin, ReplicaReadMixin, CachedResponseMixin,
+                     SparseFieldsMixin, ValuesListMixin,
+                     viewsets.ModelViewSet):
     """
     Базовый ViewSet для API Sarafan, задающий общие настройки пагинации,
-    прав доступа и допустимые HTTP-методы.
+    прав доступа, кэширования ответов и допустимые HTTP-методы. PATCH
+    доступен администраторам для загрузки изображений multipart-запросом.
+    Чтения каталога могут обслуживаться репликами, списки строятся из
+    values() без сериализатора. Параметры fields и omit сужают ответ
+    чтения до нужных полей. Запросы клиента ограничены бюджетом
+    catalog.
     """
 
     pagination_class = SarafanPageNumberPagination
+    cursor_pagination_class = SarafanCursorPagination
     permission_classes = (ReadOrAdminOnly,)
-    http_method_names = ('get',)
+    http_method_names = ('get', 'patch')
+    throttle_scope = 'catalog'
+
+    def get_pagination_class(self):
+        """
+        Возвращает keyset-пагинатор, если клиент передал параметр cursor,
+        иначе пагинатор limit/offset.
+        """
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        if cursor_param in self.request.query_params:
+            return self.cursor_pagination_class
+        return self.pagination_class
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = self.get_pagination_class()()
+        return self._paginator
 
 
 class CategoryViewSet(SarafanViewSet):
@@ -34,8 +78,32 @@ class CategoryViewSet(SarafanViewSet):
     настройки SarafanViewSet.
     """
 
-    queryset = Category.objects.all()
+    queryset = Category.objects.prefetch_related('subcategory')
     serializer_class = CategorySerializer
+    representation_class = CategoryRepresentation
+    cache_dependencies = (Category, Subcategory)
+
+    @action(methods=('get',), detail=False, url_path='tree', url_name='tree')
+    def get_tree(self, request, *args, **kwargs):
+        """
+        Возвращает дерево категорий с подкатегориями из снимка в памяти
+        процесса, не обращаясь к базе данных, пока снимок актуален.
+        """
+        version, tree = category_tree.get()
+        return Response({
+            'version': '-'.join(str(part) for part in version),
+            'categories': [{
+                **category,
+                'image': self.get_absolute_url(category['image']),
+                'subcategories': [{
+                    **subcategory,
+                    'image': self.get_absolute_url(subcategory['image'])
+                } for subcategory in category['subcategories']]
+            } for category in tree],
+        })
+
+    def get_absolute_url(self, url):
+        return self.request.build_absolute_uri(url) if url else None
 
 
 class SubcategoryViewSet(SarafanViewSet):
@@ -43,19 +111,69 @@ class SubcategoryViewSet(SarafanViewSet):
     ViewSet для управления объектами Subcategory, унаследованный от
     SarafanViewSet с использованием SubcategorySerializer.
     """
-    queryset = Subcategory.objects.all()
+    queryset = Subcategory.objects.select_related('category')
     serializer_class = SubcategorySerializer
+    representation_class = SubcategoryRepresentation
+    cache_dependencies = (Category, Subcategory)
 
 
 class ProductViewSet(SarafanViewSet):
     """
     ViewSet для управления объектами Product, использующий базовые
-    права доступа и ProductSerializer.
+    права доступа и ProductSerializer. Список фильтруется по category,
+    subcategory, price_min, price_max и сортируется параметром ordering.
     """
 
-    queryset = Product.objects.all()
+    queryset = Product.objects.select_related('category', 'subcategory')
     permission_classes = (ReadOrAdminOnly,)
     serializer_class = ProductSerializer
+    representation_class = ProductRepresentation
+    cache_dependencies = (Product, Category, Subcategory)
+    filter_backends = (ProductFilterBackend, SarafanOrderingFilter)
+    ordering_fields = ('price', 'created_at')
+
+    def get_pagination_class(self):
+        if self.action == 'search':
+            return SarafanSearchPagination
+        return super().get_pagination_class()
+
+    @action(methods=('get',), detail=False, url_path='search',
+            url_name='search')
+    def search(self, request, *args, **kwargs):
+        """
+        Полнотекстовый поиск продуктов по параметру q с фильтрами по
+        категории, подкатегории и цене. Результаты отсортированы по
+        релевантности.
+        """
+        return self.get_cached_response(self.get_search_response, request)
+
+    def get_search_response(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError(SEARCH_QUERY_REQUIRED)
+        return self.get_list_response(search_products(
+            self.filter_queryset(self.get_queryset()), query))
+
+    @action(methods=('get',), detail=False, url_path='export',
+            url_name='export', permission_classes=(IsAdminUser,))
+    def export(self, request, *args, **kwargs):
+        """
+        Потоково выгружает весь каталог в JSONL или CSV (параметр
+        file_format), с updated_since — только измененные продукты. База
+        для чтения выбирается до начала потока, пока действует выбор
+        реплики для запроса.
+        """
+        params = ProductExportSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        file_format = params.validated_data['file_format']
+        queryset = get_export_queryset(
+            params.validated_data.get('updated_since'))
+        response = StreamingHttpResponse(
+            export_catalog(queryset.using(queryset.db), file_format),
+            content_type=CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = (
+            f'attachment; filename="catalog.{file_format}"')
+        return response
 
 
 class ShoppingCartViewSet(viewsets.ViewSet):
@@ -69,6 +187,7 @@ class ShoppingCartViewSet(viewsets.ViewSet):
     @action(methods=('get',), detail=False, url_path='view-my-cart')
     def get_shopping_cart(self, request, *args, **kwargs):
         user = self.request.user
+        version = cart_summary.get_version(user.pk)
         queryset = ShoppingCart.objects.filter(
             user=user, is_in_shopping_cart=True
         ).annotate(
@@ -78,26 +197,32 @@ class ShoppingCartViewSet(viewsets.ViewSet):
                 F('amount') * F('product__price'),
                 output_field=DecimalField(max_digits=10, decimal_places=2)
             )
-        ).values('product_name', 'amount', 'product_price', 'total_price')
-
-        cart_summary = queryset.aggregate(
-            total_items=Sum('amount'),
-            total_cart_price=Coalesce(
-                ExpressionWrapper(
-                    Sum(F('amount') * F('product__price')),
-                    output_field=DecimalField(max_digits=10, decimal_places=2)
-                ),
-                Value(0, output_field=DecimalField(
-                    max_digits=10, decimal_places=2))
-            )
-        )
+        ).values('product_id', 'product_name', 'amount', 'product_price',
+                 'total_price')
+
+        cart_contents, lines = [], {}
+        for row in queryset:
+            lines[row.pop('product_id')] = (row['amount'],
+                                            row['product_price'])
+            cart_contents.append(row)
+        cart_summary.set_lines(user.pk, lines, version)
 
         return Response({
-            'cart_contents': list(queryset),
-            'total_items': cart_summary['total_items'],
-            'total_price': cart_summary['total_cart_price'],
+            'cart_contents': cart_contents,
+            'total_items': sum(row['amount'] for row in cart_contents)
+            if cart_contents else None,
+            'total_price': sum((row['total_price'] for row in cart_contents),
+                               Decimal(0)),
         })
 
+    @action(methods=('get',), detail=False, url_path='summary')
+    def get_summary(self, request, *args, **kwargs):
+        """
+        Возвращает итоги корзины для бейджа из кэшированной сводки. После
+        изменения корзины сводка собирается заново одним запросом.
+        """
+        return Response(cart_summary.get_summary(self.request.user.pk))
+
 
 class ShoppingCartGeneric(generics.GenericAPIView):
     """
@@ -107,6 +232,7 @@ class ShoppingCartGeneric(generics.GenericAPIView):
 
     queryset = ShoppingCart.objects.all()
     permission_classes = (AuthorOnly,)
+    throttle_scope = 'cart'
     lookup_field = 'product'
     lookup_url_kwarg = 'product_pk'
     serializer_class = ShoppingCartPostPutDeleteSerializer
@@ -130,25 +256,63 @@ class ShoppingCartGeneric(generics.GenericAPIView):
         return Response(status=status.HTTP_200_OK, data=serializer.data)
 
     def delete(self, request, *args, **kwargs):
-        shopping_cart = self.get_object()
-        shopping_cart.is_in_shopping_cart = False
-        shopping_cart.save()
+        """
+        Убирает продукт из корзины пользователя одним UPDATE без
+        предварительного чтения строки.
+        """
+        product_pk = self.kwargs[self.lookup_url_kwarg]
+        if not retry_on_conflict(ShoppingCart.objects.remove_product,
+                                 self.get_user(), product_pk):
+            raise NotFound
+        cart_summary.invalidate_on_commit([self.get_user().pk])
         return Response(
             status=status.HTTP_204_NO_CONTENT, data=SUCCESS_MESSAGE)
 
 
+class ShoppingCartBatch(generics.GenericAPIView):
+    """
+    GenericAPIView для пакетного изменения корзины: принимает список
+    операций add/set/remove и возвращает результат по каждой из них.
+    """
+
+    permission_classes = (AuthorOnly,)
+    throttle_scope = 'cart'
+    serializer_class = ShoppingCartBatchItemSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        return Response(status=status.HTTP_200_OK, data=serializer.save())
+
+
 class ClearShoppingCart(generics.GenericAPIView):
     """
     GenericAPIView для очистки корзины пользователя.
     """
 
     permission_classes = (AuthorOnly,)
+    throttle_scope = 'cart'
 
     def delete(self, request, *args, **kwargs):
         user = self.request.user
-        (ShoppingCart.objects.filter(
-            user=user, is_in_shopping_cart=True)
-         .update(is_in_shopping_cart=False, amount=0))
+        retry_on_conflict(
+            ShoppingCart.objects.filter(
+                user=user, is_in_shopping_cart=True).update,
+            is_in_shopping_cart=False, amount=0, updated_at=timezone.now(),
+            version=F('version') + 1)
+        cart_summary.invalidate_on_commit([user.pk])
 
         return Response(
             status=status.HTTP_204_NO_CONTENT, data=SUCCESS_MESSAGE)
+
+
+class RevokeToken(generics.GenericAPIView):
+    """
+    GenericAPIView для отзыва токена доступа, которым подписан запрос.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,24 +1,23 @@
 from django.contrib import admin
 
+from api.admin_widgets import ListEditableAutocompleteMixin
 from category.models import Category, Subcategory
 
 
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug',)
-    search_fields = ('slug', 'title')
-    list_filter = ('slug',)
+    search_fields = ('=slug', 'title')
     list_display_links = ('slug', 'title')
 
 
-class SubCategoryAdmin(admin.ModelAdmin):
+class SubCategoryAdmin(ListEditableAutocompleteMixin, admin.ModelAdmin):
     list_display = ('title', 'slug', 'category',)
     list_select_related = ('category',)
     list_editable = ('category',)
-    search_fields = ('slug', 'title')
-    list_filter = ('slug',)
+    autocomplete_fields = ('category',)
+    search_fields = ('=slug', 'title')
     list_display_links = ('slug', 'title')
 
 
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Subcategory, SubCategoryAdmin)
-
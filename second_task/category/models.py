@@ -12,6 +12,10 @@ class Category(BaseModel):
     class Meta:
         verbose_name = 'Категория'
         verbose_name_plural = 'Категории'
+        indexes = [
+            models.Index(fields=('created_at', 'id'),
+                         name='category_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -29,6 +33,10 @@ class Subcategory(BaseModel):
     class Meta:
         verbose_name = 'Подкатегория'
         verbose_name_plural = 'Подкатегории'
+        indexes = [
+            models.Index(fields=('created_at', 'id'),
+                         name='subcategory_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
\ No newline at end of file
@@ -1,16 +1,42 @@
 from django.contrib import admin
 
+from api.admin_widgets import ListEditableAutocompleteMixin
+from api.counts import EstimatedCountPaginator
 from product.models import Product, ShoppingCart
+from product.search import search_products
 
 
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ListEditableAutocompleteMixin, admin.ModelAdmin):
     list_display = ('name', 'price', 'subcategory', 'category')
     list_select_related = ('subcategory', 'category')
     list_editable = ('subcategory', 'category')
-    list_filter = ('slug', 'subcategory', 'category')
+    list_filter = ('subcategory', 'category')
+    autocomplete_fields = ('subcategory', 'category')
     search_fields = ('name', 'slug')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Ищет по полнотекстовому индексу name/slug, как поиск API, вместо
+        icontains по search_fields. Используется и автодополнением
+        продукта в других разделах админки.
+        """
+        if not search_term:
+            return queryset, False
+        return search_products(queryset, search_term), False
 
-admin.site.register(Product, ProductAdmin)
 
-admin.site.register(ShoppingCart)
\ No newline at end of file
+class ShoppingCartAdmin(admin.ModelAdmin):
+    list_display = ('user', 'product', 'amount', 'is_in_shopping_cart',
+                    'updated_at')
+    list_select_related = ('user', 'product')
+    list_filter = ('is_in_shopping_cart',)
+    autocomplete_fields = ('user', 'product')
+    search_fields = ('=user__username',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+admin.site.register(Product, ProductAdmin)
+admin.site.register(ShoppingCart, ShoppingCartAdmin)
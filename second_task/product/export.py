@@ -0,0 +1,75 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Product
+from .renditions import IMAGE_FIELDS
+
+EXPORT_FIELDS = ('id', 'slug', 'name', 'price', 'category', 'subcategory',
+                 *IMAGE_FIELDS, 'created_at', 'updated_at')
+EXPORT_COLUMNS = ('id', 'slug', 'name', 'price', 'category__slug',
+                  'subcategory__slug', *IMAGE_FIELDS, 'created_at',
+                  'updated_at')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+FORMATS = tuple(CONTENT_TYPES)
+
+encoder = DjangoJSONEncoder()
+
+
+class Echo:
+    """Псевдофайл для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+csv_writer = csv.writer(Echo())
+
+
+def get_export_queryset(updated_since=None):
+    """
+    Возвращает кортежи EXPORT_COLUMNS всех продуктов или только
+    измененных начиная с updated_since. Инкрементальная выгрузка
+    упорядочена по индексу product_updated_id_idx.
+    """
+    queryset = Product.objects.values_list(*EXPORT_COLUMNS)
+    if updated_since is None:
+        return queryset.order_by('id')
+    return queryset.filter(
+        updated_at__gte=updated_since).order_by('updated_at', 'id')
+
+
+def prepare_row(row):
+    return [value if isinstance(value, (int, str)) or value is None
+            else encoder.default(value) for value in row]
+
+
+def write_jsonl(rows):
+    return ''.join(
+        json.dumps(dict(zip(EXPORT_FIELDS, prepare_row(row))),
+                   ensure_ascii=False) + '\n'
+        for row in rows)
+
+
+def write_csv(rows):
+    return ''.join(csv_writer.writerow(prepare_row(row)) for row in rows)
+
+
+def export_catalog(queryset, file_format, chunk_size=2000):
+    """
+    Отдает выгрузку строками по chunk_size продуктов. Строки читаются
+    через iterator() серверным курсором, поэтому в памяти одновременно
+    находится не больше одной пачки. Колонки совпадают с форматом
+    import_catalog, выгрузку можно загрузить обратно.
+    """
+    write = write_csv if file_format == 'csv' else write_jsonl
+    if file_format == 'csv':
+        yield write_csv([EXPORT_FIELDS])
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield write(chunk)
@@ -0,0 +1,77 @@
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from product.models import ShoppingCart
+
+ARCHIVE_FIELDS = ('id', 'user_id', 'product_id', 'amount', 'updated_at')
+
+
+class Command(BaseCommand):
+    help = ('Удаляет неактивные строки корзины старше заданного возраста '
+            'небольшими пачками, при необходимости архивируя их в JSONL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int,
+                            default=settings.CART_COMPACTION_AGE_DAYS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--sleep', type=float, default=0.1,
+            help='Пауза между пачками в секундах.')
+        parser.add_argument(
+            '--archive', metavar='PATH',
+            help='Дописывать удаляемые строки в JSONL-файл.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def get_batch(self, cutoff, batch_size):
+        queryset = ShoppingCart.objects.filter(
+            is_in_shopping_cart=False, updated_at__lt=cutoff)
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        return list(queryset.order_by('updated_at').values(
+            *ARCHIVE_FIELDS)[:batch_size])
+
+    def handle(self, *args, older_than_days, batch_size, sleep, archive,
+               dry_run, **options):
+        cutoff = timezone.now() - timedelta(days=older_than_days)
+        if dry_run:
+            count = ShoppingCart.objects.filter(
+                is_in_shopping_cart=False, updated_at__lt=cutoff).count()
+            self.stdout.write(f'Будет удалено строк: {count}')
+            return
+        archive_file = open(archive, 'a') if archive else None
+        deleted = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                with transaction.atomic():
+                    batch = self.get_batch(cutoff, batch_size)
+                    if not batch:
+                        break
+                    if archive_file is not None:
+                        for row in batch:
+                            archive_file.write(
+                                json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                        archive_file.flush()
+                        os.fsync(archive_file.fileno())
+                    deleted += ShoppingCart.objects.filter(
+                        pk__in=[row['id'] for row in batch],
+                        is_in_shopping_cart=False, updated_at__lt=cutoff
+                    ).delete()[0]
+                self.stdout.write(f'Удалено строк: {deleted}', ending='\r')
+                if len(batch) < batch_size:
+                    break
+                time.sleep(sleep)
+        finally:
+            if archive_file is not None:
+                archive_file.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено строк: {deleted} за '
+            f'{time.perf_counter() - started:.2f} с'))
@@ -0,0 +1,56 @@
+import time
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import get_current_timezone, is_naive, make_aware
+
+from product.export import FORMATS, export_catalog, get_export_queryset
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает каталог продуктов в CSV или JSONL, '
+            'целиком или только измененные продукты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию определяется по расширению '
+                                 'файла, иначе jsonl.')
+        parser.add_argument('--output',
+                            help='Файл выгрузки, по умолчанию stdout.')
+        parser.add_argument(
+            '--updated-since',
+            help='Выгрузить продукты, измененные начиная с этой даты '
+                 '(ISO 8601).')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    @staticmethod
+    def parse_since(value):
+        try:
+            since = parse_datetime(value)
+        except ValueError:
+            since = None
+        if since is None:
+            raise CommandError(f'Некорректная дата: {value!r}')
+        if is_naive(since):
+            since = make_aware(since, get_current_timezone())
+        return since
+
+    def handle(self, *args, format, output, updated_since, chunk_size,
+               **options):
+        file_format = format or (
+            'csv' if output and output.lower().endswith('.csv') else 'jsonl')
+        queryset = get_export_queryset(
+            self.parse_since(updated_since) if updated_since else None)
+        chunks = export_catalog(queryset, file_format, chunk_size)
+        if not output:
+            write = partial(self.stdout.write, ending='')
+            for chunk in chunks:
+                write(chunk)
+            return
+        started = time.perf_counter()
+        with open(output, 'w', encoding='utf-8', newline='') as file:
+            file.writelines(chunks)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгрузка {output}, время: '
+            f'{time.perf_counter() - started:.2f} с'))
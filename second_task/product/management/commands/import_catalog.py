@@ -0,0 +1,221 @@
+import csv
+import json
+import os
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api import cart_summary
+from api.versions import bump_version
+from category.models import Category, Subcategory
+from product.models import Product, ShoppingCart
+from product.renditions import IMAGE_FIELDS
+
+IMPORT_FIELDS = ('slug', 'name', 'price', 'category', 'subcategory',
+                 *IMAGE_FIELDS)
+FORMATS = ('csv', 'jsonl')
+
+
+class LineReader:
+    """
+    Построчно читает файл в двоичном режиме с заданного смещения и
+    помнит смещение конца последней прочитанной строки, чтобы с него
+    можно было продолжить импорт.
+    """
+
+    def __init__(self, file, offset=0):
+        file.seek(offset)
+        self.file = file
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.file.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode('utf-8-sig')
+
+
+class Command(BaseCommand):
+    help = ('Потоково импортирует продукты из CSV или JSONL пакетными '
+            'upsert по slug с контрольными точками для продолжения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию определяется по расширению.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки, по умолчанию <path>.checkpoint.')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать заново, игнорируя контрольную точку.')
+        parser.add_argument(
+            '--check-images', action='store_true',
+            help='Отклонять строки, изображений которых нет в MEDIA_ROOT.')
+
+    def load_slugs(self):
+        """Строит карты слагов категорий и подкатегорий в памяти."""
+        self.categories = dict(Category.objects.values_list('slug', 'id'))
+        self.subcategories = {
+            slug: (pk, category_id) for slug, pk, category_id in
+            Subcategory.objects.values_list('slug', 'id', 'category_id')}
+
+    def read_records(self, file, file_format, offset):
+        """
+        Отдает пары (запись, смещение после нее). Заголовок CSV всегда
+        читается с начала файла, данные — с offset.
+        """
+        if file_format == 'csv':
+            header_reader = LineReader(file)
+            header = next(csv.reader(header_reader), None)
+            if header is None:
+                return
+            reader = LineReader(file, max(offset, header_reader.offset))
+            for row in csv.reader(reader):
+                yield dict(zip(header, row)), reader.offset
+        else:
+            reader = LineReader(file, offset)
+            for line in reader:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield record, reader.offset
+
+    def build_row(self, record, check_images):
+        """
+        Проверяет запись валидаторами полей модели и возвращает кортеж
+        значений IMPORT_FIELDS, не создавая объект Product.
+        """
+        if not isinstance(record, dict):
+            raise ValidationError('Строка не является объектом.')
+        subcategory_slug = record.get('subcategory') or ''
+        if subcategory_slug not in self.subcategories:
+            raise ValidationError(
+                f'Неизвестная подкатегория: {subcategory_slug!r}')
+        subcategory_id, category_id = self.subcategories[subcategory_slug]
+        category_slug = record.get('category')
+        if category_slug and self.categories.get(
+                category_slug) != category_id:
+            raise ValidationError(
+                f'Подкатегория {subcategory_slug} не относится к '
+                f'категории {category_slug}')
+        values = {name: self.fields[name].clean(record.get(name), None)
+                  for name in ('slug', 'name', 'price')}
+        for name in IMAGE_FIELDS:
+            path = values[name] = record.get(name) or ''
+            if path:
+                self.fields[name].run_validators(path)
+            if check_images and not os.path.isfile(
+                    os.path.join(settings.MEDIA_ROOT, path)):
+                raise ValidationError(f'Нет изображения {name}: {path!r}')
+        values.update(category=category_id, subcategory=subcategory_id)
+        return tuple(values[name] for name in IMPORT_FIELDS)
+
+    def flush(self, batch):
+        """
+        Вставляет или обновляет пачку продуктов в одной транзакции. После
+        ее фиксации сбрасывает итоги корзин с этими продуктами и меняет
+        версию продуктов в общем кэше: иначе параллельный запрос мог бы
+        закэшировать данные, прочитанные до фиксации.
+        """
+        with transaction.atomic():
+            Product.objects.upsert(batch.values(), IMPORT_FIELDS)
+            user_ids = list(ShoppingCart.objects.filter(
+                product__slug__in=list(batch), is_in_shopping_cart=True
+            ).order_by().values_list('user_id', flat=True).distinct())
+            transaction.on_commit(partial(cart_summary.invalidate, user_ids))
+            transaction.on_commit(partial(bump_version, Product))
+
+    def load_checkpoint(self, path, source, restart):
+        if restart or not os.path.exists(path):
+            return None
+        with open(path) as file:
+            checkpoint = json.load(file)
+        if checkpoint['source'] != source:
+            raise CommandError(f'Файл изменился после контрольной точки '
+                               f'{path}, запустите с --restart.')
+        return checkpoint
+
+    @staticmethod
+    def save_checkpoint(path, checkpoint):
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(checkpoint, file)
+        os.replace(temporary, path)
+
+    def handle(self, *args, path, format, batch_size, checkpoint, restart,
+               check_images, **options):
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл {path} не найден.')
+        file_format = format or (
+            'csv' if path.lower().endswith('.csv') else 'jsonl')
+        checkpoint_path = checkpoint or f'{path}.checkpoint'
+        stat = os.stat(path)
+        source = {'size': stat.st_size, 'mtime': stat.st_mtime}
+        state = self.load_checkpoint(checkpoint_path, source, restart) or {
+            'source': source, 'offset': 0, 'rows': 0, 'imported': 0,
+            'rejected': 0}
+        if state['offset']:
+            self.stdout.write(f'Продолжение со строки {state["rows"] + 1}')
+        self.load_slugs()
+        self.fields = {name: Product._meta.get_field(name)
+                       for name in IMPORT_FIELDS}
+
+        started = time.perf_counter()
+        rows = rejected = 0
+        batch = {}
+
+        def commit(offset):
+            """Записывает пачку и сдвигает контрольную точку за нее."""
+            nonlocal rows, rejected, batch
+            if batch:
+                self.flush(batch)
+            state['imported'] += len(batch)
+            state['rows'] += rows
+            state['rejected'] += rejected
+            state['offset'] = offset
+            rows = rejected = 0
+            batch = {}
+            self.save_checkpoint(checkpoint_path, state)
+            elapsed = time.perf_counter() - started
+            rate = state['rows'] / elapsed if elapsed else 0
+            self.stdout.write(f'Строк: {state["rows"]}, {rate:.0f} строк/с',
+                              ending='\r')
+
+        offset = state['offset']
+        with open(path, 'rb') as file:
+            for record, offset in self.read_records(file, file_format,
+                                                    offset):
+                rows += 1
+                try:
+                    row = self.build_row(record, check_images)
+                except ValidationError as error:
+                    rejected += 1
+                    self.stderr.write(
+                        f'Строка {state["rows"] + rows}: '
+                        f'{"; ".join(error.messages)}')
+                else:
+                    batch[row[0]] = row
+                if len(batch) >= batch_size:
+                    commit(offset)
+        commit(offset)
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк: {state["rows"]}, импортировано: {state["imported"]}, '
+            f'отклонено: {state["rejected"]}, время: {elapsed:.2f} с, '
+            f'{state["rows"] / elapsed if elapsed else 0:.0f} строк/с'))
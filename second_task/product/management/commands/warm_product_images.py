@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from api.versions import bump_version
+from product.models import Product
+from product.renditions import (create_executor, derive_renditions,
+                                warm_renditions)
+
+
+def warm_chunk(product_pks, derive):
+    """Обрабатывает пачку продуктов в процессе пула."""
+    queryset = Product.objects.filter(pk__in=product_pks)
+    if derive:
+        for product in queryset.exclude(large=''):
+            derive_renditions(product)
+    return len(product_pks), *warm_renditions(queryset)
+
+
+class Command(BaseCommand):
+    help = ('Параллельно создает размеры изображений всех продуктов и '
+            'выводит производительность.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--chunk-size', type=int, default=100)
+        parser.add_argument(
+            '--derive', action='store_true',
+            help='Построить из large пустые thumbnail/medium и уменьшить '
+                 'large.')
+
+    def handle(self, *args, workers, chunk_size, derive, **options):
+        product_pks = list(Product.objects.order_by('pk').values_list(
+            'pk', flat=True))
+        chunks = [product_pks[start:start + chunk_size]
+                  for start in range(0, len(product_pks), chunk_size)]
+        products = images = 0
+        failed = []
+        started = time.perf_counter()
+        with create_executor(workers) as executor:
+            futures = [executor.submit(warm_chunk, chunk, derive)
+                       for chunk in chunks]
+            for future in as_completed(futures):
+                chunk_products, chunk_images, chunk_failed = future.result()
+                products += chunk_products
+                images += chunk_images
+                failed.extend(chunk_failed)
+                self.stdout.write(f'{products}/{len(product_pks)} продуктов',
+                                  ending='\r')
+        elapsed = time.perf_counter() - started
+        if derive:
+            bump_version(Product)
+        self.stdout.write('')
+        for path in failed:
+            self.stderr.write(f'Не удалось обработать: {path}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Продуктов: {products}, изображений: {images}, ошибок: '
+            f'{len(failed)}, время: {elapsed:.2f} с, '
+            f'{images / elapsed if elapsed else 0:.1f} изображений/с'))
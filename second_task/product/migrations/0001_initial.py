@@ -0,0 +1,56 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:21
+
+import django.core.validators
+import django.db.models.deletion
+import re
+import versatileimagefield.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('category', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(default=None, max_length=64, unique=True, validators=[django.core.validators.RegexValidator(re.compile('^[-a-zA-Z0-9_]+\\Z'), 'Enter a valid “slug” consisting of letters, numbers, underscores or hyphens.', 'invalid')], verbose_name='Слаг')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Добавлено')),
+                ('name', models.CharField(max_length=64, verbose_name='товар')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(1, message='Цена должна быть больше или равно 1')], verbose_name='Цена')),
+                ('thumbnail', versatileimagefield.fields.VersatileImageField(upload_to='images/products/thumbnails/', verbose_name='Миниатюра')),
+                ('medium', versatileimagefield.fields.VersatileImageField(upload_to='images/products/medium/', verbose_name='Среднее изображение')),
+                ('large', versatileimagefield.fields.VersatileImageField(upload_to='images/products/large/', verbose_name='Большое изображение')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='products', to='category.category', verbose_name='Категория')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='%(class)s_products', to='category.subcategory', verbose_name='Подкатегория')),
+            ],
+            options={
+                'verbose_name': 'Товары',
+                'verbose_name_plural': 'Товар',
+            },
+        ),
+        migrations.CreateModel(
+            name='ShoppingCart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_in_shopping_cart', models.BooleanField(default=False, verbose_name='в корзине')),
+                ('amount', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1, message='Кол-во должна быть больше или равно 1')], verbose_name='Кол-Во')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart', to='product.product', verbose_name='Продукт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Корзина',
+                'verbose_name_plural': 'Корзина',
+                'ordering': ('user',),
+                'constraints': [models.UniqueConstraint(fields=('user', 'product'), name='user_product')],
+            },
+        ),
+    ]
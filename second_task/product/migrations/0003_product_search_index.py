@@ -0,0 +1,59 @@
+from django.db import migrations
+
+SQLITE_FORWARD = (
+    "CREATE VIRTUAL TABLE product_product_fts USING fts5("
+    "name, slug, content='product_product', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER product_product_fts_insert AFTER INSERT "
+    "ON product_product BEGIN "
+    "INSERT INTO product_product_fts(rowid, name, slug) "
+    "VALUES (new.id, new.name, new.slug); END",
+    "CREATE TRIGGER product_product_fts_delete AFTER DELETE "
+    "ON product_product BEGIN "
+    "INSERT INTO product_product_fts(product_product_fts, rowid, name, slug) "
+    "VALUES ('delete', old.id, old.name, old.slug); END",
+    "CREATE TRIGGER product_product_fts_update AFTER UPDATE OF name, slug "
+    "ON product_product BEGIN "
+    "INSERT INTO product_product_fts(product_product_fts, rowid, name, slug) "
+    "VALUES ('delete', old.id, old.name, old.slug); "
+    "INSERT INTO product_product_fts(rowid, name, slug) "
+    "VALUES (new.id, new.name, new.slug); END",
+    "INSERT INTO product_product_fts(product_product_fts) VALUES ('rebuild')",
+)
+SQLITE_BACKWARD = (
+    'DROP TRIGGER IF EXISTS product_product_fts_update',
+    'DROP TRIGGER IF EXISTS product_product_fts_delete',
+    'DROP TRIGGER IF EXISTS product_product_fts_insert',
+    'DROP TABLE IF EXISTS product_product_fts',
+)
+POSTGRESQL_FORWARD = (
+    "CREATE INDEX product_search_idx ON product_product USING GIN "
+    "(to_tsvector('simple'::regconfig, COALESCE(name, '') || ' ' || "
+    "COALESCE(slug, '')))",
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS product_search_idx',
+)
+
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0002_created_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({'sqlite': SQLITE_FORWARD,
+                            'postgresql': POSTGRESQL_FORWARD}),
+            run_statements({'sqlite': SQLITE_BACKWARD,
+                            'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:50
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_updated_at(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    Product.objects.filter(updated_at__isnull=True).update(
+        updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0002_created_id_index'),
+        ('product', '0005_shoppingcart_compaction'),
+    ]
+
+    operations = [
+        # auto_now дает полю значение по умолчанию, из-за которого SQLite
+        # пересоздает таблицу и теряет триггеры product_product_fts, поэтому
+        # в базу добавляется простая nullable колонка.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AddField(
+                    model_name='product',
+                    name='updated_at',
+                    field=models.DateTimeField(null=True, verbose_name='Обновлено'),
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='product',
+                    name='updated_at',
+                    field=models.DateTimeField(auto_now=True, null=True, verbose_name='Обновлено'),
+                ),
+            ],
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'id'], name='product_updated_id_idx'),
+        ),
+    ]
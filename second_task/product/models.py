@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, connections
+from django.db.models import Case, F, Q, Value, When
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from versatileimagefield.fields import VersatileImageField
 
 from core.models import BaseModel
@@ -9,6 +11,43 @@ from category.models import Category, Subcategory
 User = get_user_model()
 
 
+class ProductQuerySet(models.QuerySet):
+    """
+    QuerySet продуктов с пакетной записью, минующей создание объектов
+    модели.
+    """
+
+    def upsert(self, rows, fields):
+        """
+        Вставляет или обновляет продукты по slug одним executemany
+        INSERT ... ON CONFLICT DO UPDATE. rows — кортежи значений полей
+        fields, slug должен быть первым. Дата изменения выставляется
+        всем строкам, дата создания — только новым.
+        """
+        connection = connections[self.db]
+        opts = self.model._meta
+        quote = connection.ops.quote_name
+        insert_fields = [opts.get_field(name)
+                         for name in (*fields, 'updated_at', 'created_at')]
+        columns = [quote(field.column) for field in insert_fields]
+        sql = (
+            'INSERT INTO {table} ({columns}) VALUES ({values}) '
+            'ON CONFLICT ({slug}) DO UPDATE SET {updates}'
+        ).format(
+            table=quote(opts.db_table), columns=', '.join(columns),
+            values=', '.join(['%s'] * len(columns)), slug=columns[0],
+            updates=', '.join(f'{column} = excluded.{column}'
+                              for column in columns[1:-1]))
+        now = timezone.now()
+        params = [
+            [field.get_db_prep_save(value, connection)
+             for field, value in zip(insert_fields, (*row, now, now))]
+            for row in rows]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        return len(params)
+
+
 class Product(BaseModel):
     name = models.CharField(max_length=64, verbose_name='товар')
 
@@ -31,15 +70,137 @@ class Product(BaseModel):
                                  verbose_name='Среднее изображение')
     large = VersatileImageField(upload_to='images/products/large/',
                                 verbose_name='Большое изображение')
+    # null=True позволяет добавить колонку без пересоздания таблицы,
+    # см. миграцию 0006.
+    updated_at = models.DateTimeField(auto_now=True, null=True,
+                                      verbose_name='Обновлено')
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Товары'
         verbose_name_plural = 'Товар'
+        indexes = [
+            models.Index(fields=('created_at', 'id'),
+                         name='product_created_id_idx'),
+            models.Index(fields=('subcategory', 'price'),
+                         name='product_sub_price_idx'),
+            models.Index(fields=('category', 'created_at'),
+                         name='product_cat_created_idx'),
+            models.Index(fields=('updated_at', 'id'),
+                         name='product_updated_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class ShoppingCartQuerySet(models.QuerySet):
+    """
+    QuerySet корзины с атомарными операциями записи, выполняющимися
+    одним SQL-запросом.
+    """
+
+    def get_columns(self):
+        connection = connections[self.db]
+        opts = self.model._meta
+        return connection, {
+            'table': connection.ops.quote_name(opts.db_table),
+            **{field: connection.ops.quote_name(opts.get_field(field).column)
+               for field in ('id', 'user', 'product', 'amount',
+                             'is_in_shopping_cart', 'updated_at', 'version')}
+        }
+
+    def get_now(self):
+        return self.model._meta.get_field('updated_at').get_db_prep_value(
+            timezone.now(), connections[self.db])
+
+    def add_product(self, user, product, amount):
+        """
+        Добавляет продукт в корзину через INSERT ... ON CONFLICT по
+        ограничению user_product. Удаленная из корзины строка
+        восстанавливается, активная не изменяется. Возвращает объект
+        корзины или None, если продукт уже в корзине.
+        """
+        connection, columns = self.get_columns()
+        sql = (
+            'INSERT INTO {table} ({user}, {product}, {amount}, '
+            '{is_in_shopping_cart}, {updated_at}, {version}) '
+            'VALUES (%s, %s, %s, %s, %s, 1) '
+            'ON CONFLICT ({user}, {product}) DO UPDATE SET '
+            '{amount} = excluded.{amount}, '
+            '{is_in_shopping_cart} = excluded.{is_in_shopping_cart}, '
+            '{updated_at} = excluded.{updated_at}, '
+            '{version} = {table}.{version} + 1 '
+            'WHERE NOT {table}.{is_in_shopping_cart} '
+            'RETURNING {id}, {version}'
+        ).format(**columns)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, (user.pk, product.pk, amount, True,
+                                 self.get_now()))
+            row = cursor.fetchone()
+        return self.build_cart(row, user, product, amount)
+
+    def set_amount(self, user, product, amount, version=None):
+        """
+        Меняет кол-во продукта, находящегося в корзине. Если передана
+        version, строка меняется, только пока ее версия не изменилась.
+        Возвращает объект корзины или None, если продукта в корзине нет
+        или версия устарела.
+        """
+        connection, columns = self.get_columns()
+        sql = (
+            'UPDATE {table} SET {amount} = %s, {updated_at} = %s, '
+            '{version} = {version} + 1 '
+            'WHERE {user} = %s AND {product} = %s AND {is_in_shopping_cart}'
+        ).format(**columns)
+        params = [amount, self.get_now(), user.pk, product.pk]
+        if version is not None:
+            sql += ' AND {version} = %s'.format(**columns)
+            params.append(version)
+        with connection.cursor() as cursor:
+            cursor.execute(sql + ' RETURNING {id}, {version}'.format(
+                **columns), params)
+            row = cursor.fetchone()
+        return self.build_cart(row, user, product, amount)
+
+    def remove_product(self, user, product_id):
+        """
+        Убирает продукт из корзины. Возвращает число найденных строк
+        пользователя с этим продуктом, в том числе уже убранных.
+        """
+        return self.filter(user=user, product_id=product_id).update(
+            is_in_shopping_cart=False, updated_at=timezone.now(),
+            version=F('version') + 1)
+
+    def update_if_unchanged(self, lines, fields, expected):
+        """
+        Записывает поля fields строк корзины одним UPDATE и увеличивает
+        их версии. Строка обновляется, только если ее поля сохранили
+        значения expected вида {pk: {поле: значение}}, прочитанные до
+        изменения. Возвращает число обновленных строк; если оно меньше
+        len(lines), строку успел изменить другой запрос.
+        """
+        if not lines:
+            return 0
+        condition = Q()
+        for line in lines:
+            condition |= Q(pk=line.pk, **expected[line.pk])
+        opts = self.model._meta
+        return self.filter(condition).update(version=F('version') + 1, **{
+            field: Case(*(When(pk=line.pk, then=Value(
+                getattr(line, field), output_field=opts.get_field(field)))
+                for line in lines), output_field=opts.get_field(field))
+            for field in fields})
+
+    def build_cart(self, row, user, product, amount):
+        if row is None:
+            return None
+        return self.model(id=row[0], user=user, product=product,
+                          amount=amount, is_in_shopping_cart=True,
+                          version=row[1])
+
+
 class ShoppingCart(models.Model):
     is_in_shopping_cart = models.BooleanField(
         default=False, verbose_name='в корзине')
@@ -55,15 +216,25 @@ class ShoppingCart(models.Model):
         MinValueValidator(
             1,
             message='Кол-во должна'' быть больше или равно 1'),))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+    version = models.PositiveIntegerField(default=1, verbose_name='Версия')
+
+    objects = ShoppingCartQuerySet.as_manager()
 
     class Meta:
-        ordering = ('user',)
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзина'
         constraints = [
             models.UniqueConstraint(
                 fields=('user', 'product'), name='user_product')
         ]
+        indexes = [
+            models.Index(fields=('user',), name='cart_active_user_idx',
+                         condition=models.Q(is_in_shopping_cart=True)),
+            models.Index(fields=('updated_at',),
+                         name='cart_inactive_updated_idx',
+                         condition=models.Q(is_in_shopping_cart=False)),
+        ]
 
     def __str__(self):
         return f'Корзина {self.user} с продуктом "{self.product}"'
@@ -0,0 +1,144 @@
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+from versatileimagefield.image_warmer import VersatileImageFieldWarmer
+
+from api.versions import bump_version
+from .models import Product
+
+IMAGE_FIELDS = ('thumbnail', 'medium', 'large')
+
+_executor = None
+
+
+def create_executor(max_workers):
+    """
+    Создает пул процессов для обработки изображений. Процессы
+    запускаются через spawn и сами настраивают Django, поэтому не делят
+    с веб-процессом соединения с базой.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers, initializer=django.setup,
+        mp_context=multiprocessing.get_context('spawn'))
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = create_executor(settings.RENDITION_WORKERS)
+    return _executor
+
+
+def get_derived_fields(product):
+    """
+    Возвращает поля, которые строятся из исходного изображения: large, в
+    котором лежит исходник, и пустые thumbnail и medium.
+    """
+    return tuple(field for field in IMAGE_FIELDS
+                 if field == 'large' or not getattr(product, field))
+
+
+def is_rendition_size(size, field):
+    """
+    Проверяет, что изображение размера size уже вписано в размер field:
+    thumbnail его бы не изменил, и перекодировать его не нужно.
+    """
+    max_width, max_height = settings.PRODUCT_IMAGE_SIZES[field]
+    return size[0] <= max_width and size[1] <= max_height
+
+
+def delete_files(storage, names):
+    for name in names:
+        storage.delete(name)
+
+
+def derive_renditions(product, fields=None):
+    """
+    Строит размеры fields (по умолчанию get_derived_fields) из исходного
+    изображения, сохраненного в поле large. Загруженные клиентом размеры
+    не перезаписываются, а large, уже вписанный в свой размер, не
+    перекодируется, поэтому повторный запуск не делает лишней работы.
+    Замененные файлы, включая исходник, удаляются после фиксации
+    транзакции. Возвращает построенные поля.
+    """
+    if fields is None:
+        fields = get_derived_fields(product)
+    with product.large.open('rb') as source, Image.open(source) as image:
+        fields = tuple(field for field in fields if field != 'large'
+                       or not is_rendition_size(image.size, field))
+        if not fields:
+            return fields
+        image.load()
+        image_format = image.format or 'JPEG'
+    name = os.path.basename(product.large.name)
+    replaced = {getattr(product, field).name for field in fields
+                if getattr(product, field)}
+    for field in fields:
+        rendition = image.copy()
+        rendition.thumbnail(settings.PRODUCT_IMAGE_SIZES[field])
+        buffer = io.BytesIO()
+        rendition.save(buffer, format=image_format)
+        getattr(product, field).save(name, ContentFile(buffer.getvalue()),
+                                     save=False)
+    product.save(update_fields=(*fields, 'updated_at'))
+    replaced -= {getattr(product, field).name for field in IMAGE_FIELDS}
+    transaction.on_commit(
+        partial(delete_files, product.large.storage, replaced))
+    return fields
+
+
+def warm_renditions(queryset):
+    """
+    Создает размеры VersatileImageField из наборов
+    PRODUCT_RENDITION_KEY_SETS. Возвращает число созданных изображений
+    и список путей, которые обработать не удалось.
+    """
+    warmed, failed = 0, []
+    for field, key_set in settings.PRODUCT_RENDITION_KEY_SETS.items():
+        warmer = VersatileImageFieldWarmer(
+            instance_or_queryset=queryset.exclude(**{field: ''}),
+            rendition_key_set=key_set, image_attr=field)
+        field_warmed, field_failed = warmer.warm()
+        warmed += field_warmed
+        failed.extend(field_failed)
+    return warmed, failed
+
+
+def process_product_images(product_pk, fields=None):
+    product = Product.objects.get(pk=product_pk)
+    derive_renditions(product, fields)
+    return warm_renditions(Product.objects.filter(pk=product_pk))
+
+
+def bump_product_version(future):
+    """
+    Меняет версию продуктов в веб-процессе, когда обработка в пуле
+    завершилась: кэш ответов не должен зависеть от того, какой кэш видят
+    процессы пула.
+    """
+    bump_version(Product)
+
+
+def submit_product_images(product_pk, fields):
+    future = get_executor().submit(process_product_images, product_pk,
+                                   fields)
+    future.add_done_callback(bump_product_version)
+
+
+def schedule_product_images(product_pk, fields=None):
+    """
+    Ставит построение размеров fields продукта в пул процессов после
+    фиксации транзакции. При RENDITION_WORKERS = 0 обработка идет сразу.
+    """
+    if not settings.RENDITION_WORKERS:
+        return process_product_images(product_pk, fields)
+    transaction.on_commit(
+        partial(submit_product_images, product_pk, fields))
@@ -0,0 +1,55 @@
+import re
+
+from django.db import connections
+
+FTS_TABLE = 'product_product_fts'
+TOKEN_RE = re.compile(r'\w+')
+
+
+def get_tokens(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+def to_fts_query(tokens):
+    """
+    Строит запрос FTS5 из слов: каждое слово ищется по префиксу, все
+    слова должны встретиться. Кавычки исключают синтаксис FTS5 из
+    пользовательского ввода.
+    """
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_products(queryset, query):
+    """
+    Отбирает продукты по полнотекстовому индексу name/slug и сортирует
+    их по релевантности. На SQLite используется таблица FTS5, на
+    PostgreSQL - GIN-индекс по tsvector, на прочих СУБД - icontains.
+    """
+    tokens = get_tokens(query)
+    if not tokens:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        # Соединение с виртуальной таблицей FTS5 недоступно через ORM:
+        # extra() позволяет отфильтровать и отсортировать по bm25 в том
+        # же запросе, что и фильтры по категории и цене.
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = product_product.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[to_fts_query(tokens)],
+            select={'rank': f'bm25({FTS_TABLE})'},
+            order_by=['rank', 'id'],
+        )
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                                    SearchVector)
+        vector = SearchVector('name', 'slug', config='simple')
+        search = SearchQuery(' & '.join(f'{token}:*' for token in tokens),
+                             config='simple', search_type='raw')
+        return queryset.annotate(
+            search=vector, rank=SearchRank(vector, search)
+        ).filter(search=search).order_by('-rank', 'id')
+    for token in tokens:
+        queryset = queryset.filter(name__icontains=token)
+    return queryset.order_by('id')
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 import os
+import sys
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -42,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'djoser',
+    'api.apps.ApiConfig',
     'category.apps.CategoryConfig',
     'product.apps.ProductConfig',
     'drf_yasg',
@@ -49,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.ProfilingMiddleware',
+    'api.admission.AdmissionControlMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,12 +86,83 @@ WSGI_APPLICATION = 'sarafan.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+DB_ENGINE = os.getenv('DB_ENGINE', 'django.db.backends.sqlite3')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': DB_ENGINE,
+        'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'USER': os.getenv('DB_USER', ''),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', ''),
+        'PORT': os.getenv('DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
+# Пул соединений psycopg (PostgreSQL) несовместим с постоянными
+# соединениями Django, поэтому CONN_MAX_AGE при нем сбрасывается.
+if os.getenv('DB_POOL', 'False') == 'True':
+    DATABASES['default'].update(CONN_MAX_AGE=0, OPTIONS={'pool': True})
+
+# Реплики перечисляются через запятую: для SQLite это пути к файлам,
+# для остальных СУБД — хосты с теми же учетными данными, что у default.
+REPLICA_DATABASES = []
+for index, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(','))):
+    alias = f'replica_{index}'
+    location = 'NAME' if DB_ENGINE.endswith('sqlite3') else 'HOST'
+    DATABASES[alias] = {**DATABASES['default'], location: replica.strip(),
+                        'TEST': {'MIRROR': 'default'}}
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['api.db_routers.ReadReplicaRouter']
+REPLICA_RETRY_SECONDS = int(os.getenv('REPLICA_RETRY_SECONDS', 30))
+PRIMARY_PIN_SECONDS = int(os.getenv('PRIMARY_PIN_SECONDS', 10))
+REPLICA_LAG_SECONDS = int(os.getenv('REPLICA_LAG_SECONDS', 10))
+
+# Версии моделей, кэш ответов, итоги корзин и отозванные токены должны
+# быть видны всем процессам: воркерам, командам и пулу обработки
+# изображений. По умолчанию кэш хранится в файлах на диске хоста, для
+# нескольких хостов задается CACHE_URL общего Redis.
+# Отозванные токены хранятся в отдельном кэше REVOCATION_CACHE_ALIAS
+# без вытеснения: запись, удаленная до срока, снова пустила бы токен.
+# Redis для него должен работать с maxmemory-policy noeviction.
+# Кэш по умолчанию хранит версионированные ответы каталога, поэтому
+# его MAX_ENTRIES задается с запасом, а при переполнении удаляется
+# 1/CACHE_CULL_FREQUENCY записей.
+CACHE_OPTIONS = {
+    'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+    'CULL_FREQUENCY': int(os.getenv('CACHE_CULL_FREQUENCY', 10)),
+}
+REVOCATION_CACHE_ALIAS = 'revocations'
+CACHE_URL = os.getenv('CACHE_URL', '')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        },
+        REVOCATION_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REVOCATION_CACHE_URL', CACHE_URL),
+        },
+    }
+else:
+    CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(
+        tempfile.gettempdir(), 'sarafan-cache'))
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+            'OPTIONS': CACHE_OPTIONS,
+        },
+        REVOCATION_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(CACHE_DIR, 'revocations'),
+            'OPTIONS': {'MAX_ENTRIES': sys.maxsize},
+        },
+    }
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -108,14 +184,61 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.SarafanJWTAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.SarafanJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.TokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'catalog': os.getenv('THROTTLE_CATALOG_RATE', '20/s'),
+        'cart': os.getenv('THROTTLE_CART_RATE', '5/s'),
+    },
 }
 
+THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', 'True') == 'True'
+THROTTLE_BURSTS = {
+    'catalog': int(os.getenv('THROTTLE_CATALOG_BURST', 100)),
+    'cart': int(os.getenv('THROTTLE_CART_BURST', 20)),
+}
+THROTTLE_SHARED_CACHE = os.getenv('THROTTLE_SHARED_CACHE', '')
+ADMISSION_MAX_CONCURRENCY = int(os.getenv('ADMISSION_MAX_CONCURRENCY', 64))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 0.5))
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 1))
+
+RESPONSE_CACHE_ENABLED = os.getenv(
+    'RESPONSE_CACHE_ENABLED', 'True') == 'True'
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 300))
+CATEGORY_TREE_MAX_AGE = int(os.getenv('CATEGORY_TREE_MAX_AGE', 300))
+FAST_LIST_REPRESENTATION = os.getenv(
+    'FAST_LIST_REPRESENTATION', 'True') == 'True'
+CART_SUMMARY_TIMEOUT = int(os.getenv('CART_SUMMARY_TIMEOUT', 300))
+CART_COMPACTION_AGE_DAYS = int(os.getenv('CART_COMPACTION_AGE_DAYS', 30))
+CART_WRITE_RETRIES = int(os.getenv('CART_WRITE_RETRIES', 5))
+CART_RETRY_BACKOFF = float(os.getenv('CART_RETRY_BACKOFF', 0.01))
+COUNT_ESTIMATE_THRESHOLD = int(os.getenv('COUNT_ESTIMATE_THRESHOLD', 100000))
+COUNT_CACHE_TIMEOUT = int(os.getenv('COUNT_CACHE_TIMEOUT', 300))
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 1.0))
+PROFILING_CPROFILE_RATE = float(os.getenv('PROFILING_CPROFILE_RATE', 0.01))
+PROFILING_STORE_DIR = os.getenv(
+    'PROFILING_STORE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_STORE_MAX_FILES = int(os.getenv('PROFILING_STORE_MAX_FILES', 100))
+
+BENCHMARK_BASELINE = os.getenv(
+    'BENCHMARK_BASELINE',
+    os.path.join(BASE_DIR, 'benchmarks', 'baseline.json'))
+BENCHMARK_TOLERANCE = float(os.getenv('BENCHMARK_TOLERANCE', 0.2))
+
 SIMPLE_JWT = {
    'ACCESS_TOKEN_LIFETIME': timedelta(hours=2),
    'AUTH_HEADER_TYPES': ('Bearer',),
 }
+AUTH_USER_CACHE_SECONDS = int(os.getenv('AUTH_USER_CACHE_SECONDS', 60))
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -136,6 +259,28 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+FILE_UPLOAD_HANDLERS = [
+    'api.uploads.SizeLimitedUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+MAX_IMAGE_UPLOAD_SIZE = int(os.getenv('MAX_IMAGE_UPLOAD_SIZE',
+                                      10 * 1024 * 1024))
+
+RENDITION_WORKERS = int(os.getenv('RENDITION_WORKERS', 2))
+PRODUCT_IMAGE_SIZES = {
+    'thumbnail': (150, 150),
+    'medium': (600, 600),
+    'large': (1200, 1200),
+}
+PRODUCT_RENDITION_KEY_SETS = {
+    'thumbnail': [('square', 'crop__150x150')],
+    'medium': [('card', 'crop__400x400')],
+    'large': [('zoom', 'thumbnail__1200x1200')],
+}
+VERSATILEIMAGEFIELD_SETTINGS = {
+    'create_images_on_demand': False,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 